@@ -0,0 +1,223 @@
+import asyncio
+import concurrent.futures
+import json
+import math
+import sys
+import threading
+import time
+import urllib.parse
+
+from cube import Cube
+from service import BatchSolver, Result
+from twophase import Tables, TwoPhaseSolver
+
+class Job :
+    """
+        One two-phase search, shared by every request for the same state: the solver, whose best holds the shortest solution so far, the event that stops it, and the number of requests still waiting on it.
+    """
+
+    def __init__ ( self, state, tables ) :
+        self.state = state
+        self.solver = TwoPhaseSolver(tables)
+        self.stop = threading.Event()
+        self.waiters = 0
+        self.future = None
+
+class AsyncSolver :
+    """
+        An AsyncSolver answers solve requests from an asyncio event loop, running the two-phase searches in an executor so the loop never blocks.
+        Concurrent requests for the same state, keyed on repr_orient_str, share one search. Every request has its own deadline, at which it gets the shortest solution found so far; a search is stopped once no request waits on it any more, whether they timed out or were cancelled.
+        The executor defaults to a thread pool: the searches then share the tables and can be stopped through an event, at the price of running one at a time under the GIL. Use service.BatchSolver for throughput across processes.
+    """
+
+    def __init__ ( self, executor = None, max_workers = None, max_time = 10.0, max_length = 30, target_length = 0, path = None ) :
+        self.tables = Tables.load(path)
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.owns_executor = executor is None
+        self.max_time = max_time
+        self.max_length = max_length
+        self.target_length = target_length
+        self.jobs = {}
+        self.searches = 0
+
+    async def __aenter__ ( self ) :
+        return self
+
+    async def __aexit__ ( self, *args ) :
+        self.close()
+
+    def close ( self ) :
+        for job in self.jobs.values() :
+            job.stop.set()
+        self.jobs.clear()
+        if self.owns_executor :
+            self.executor.shutdown(wait = False, cancel_futures = True)
+
+    def join ( self, state ) :
+        job = self.jobs.get(state)
+        if job is None :
+            job = Job(state, self.tables)
+            job.future = asyncio.get_running_loop().run_in_executor(self.executor, job.solver.solve, Cube("", state), self.max_time, self.max_length, self.target_length, job.stop)
+            job.future.add_done_callback(lambda future : self.forget(job))
+            self.jobs[state] = job
+            self.searches += 1
+        job.waiters += 1
+        return job
+
+    def leave ( self, job ) :
+        job.waiters -= 1
+        if job.waiters == 0 :
+            job.stop.set()
+            self.forget(job)
+
+    def forget ( self, job ) :
+        if self.jobs.get(job.state) is job :
+            del self.jobs[job.state]
+
+    async def solve ( self, item, deadline = None ) :
+        """
+            Solves a Cube, an algorithm string or a plain scramble, and returns a Result once the search is over or deadline seconds have passed, max_time by default.
+            At the deadline the Result holds the shortest solution found so far, or the error "timeout" when there is none yet.
+        """
+        start = time.perf_counter()
+        try :
+            state = BatchSolver.state(item)
+        except Exception as error :
+            return Result(None, item, error = str(error))
+        job = self.join(state)
+        try :
+            solution = await asyncio.wait_for(asyncio.shield(job.future), self.max_time if deadline is None else deadline)
+            error = None if solution is not None else "no solution"
+        except asyncio.TimeoutError :
+            solution = job.solver.best
+            error = None if solution is not None else "timeout"
+        except Exception as failure :
+            solution, error = None, str(failure)
+        finally :
+            self.leave(job)
+        return Result(None, item, solution, error, time.perf_counter() - start)
+
+    @staticmethod
+    def answer ( result ) :
+        return {"solution": None if result.solution is None else " ".join(result.solution), "error": result.error, "elapsed": round(result.elapsed, 6)}
+
+    @staticmethod
+    def fields ( fields ) :
+        """
+            Checks the fields of a request and returns its cube and deadline, or raises when the cube is missing or the deadline is not a finite number of seconds.
+        """
+        if not isinstance(fields, dict) or not isinstance(fields.get("cube"), str) :
+            raise Exception("Invalid request: expected a cube field")
+        deadline = fields.get("deadline")
+        if deadline is None :
+            return fields["cube"], None
+        try :
+            deadline = float(deadline)
+        except (TypeError, ValueError) :
+            deadline = math.nan
+        if not math.isfinite(deadline) or deadline < 0 :
+            raise Exception(f"Invalid deadline: {fields['deadline']!r}")
+        return fields["cube"], deadline
+
+    async def request ( self, fields ) :
+        return AsyncSolver.answer(await self.solve(*AsyncSolver.fields(fields)))
+
+    async def handle ( self, reader, writer ) :
+        """
+            Serves one HTTP request: GET /solve?cube=R+U+F'&deadline=0.5, or POST /solve with the same fields as a JSON object, answered with a JSON object; invalid fields are answered with status 400 and the error.
+            The search is cancelled when the connection is lost before the answer is ready. A client that only shuts down its sending side after the request still gets its answer, so the end of the request stream alone is not taken as a disconnect, and nothing after the request is read.
+        """
+        try :
+            method, target, version = (await reader.readline()).decode().split()
+            headers = {}
+            while True :
+                line = (await reader.readline()).decode().strip()
+                if not line :
+                    break
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            url = urllib.parse.urlsplit(target)
+            fields = dict(urllib.parse.parse_qsl(url.query))
+            if method == "POST" and body :
+                fields.update(json.loads(body))
+        except Exception :
+            await AsyncSolver.respond(writer, 400, {"error": "Invalid request"})
+            return
+        if url.path != "/solve" or method not in ["GET", "POST"] :
+            await AsyncSolver.respond(writer, 404, {"error": f"Invalid path: {method} {url.path}"})
+            return
+        try :
+            AsyncSolver.fields(fields)
+        except Exception as error :
+            await AsyncSolver.respond(writer, 400, {"solution": None, "error": str(error), "elapsed": 0.0})
+            return
+        task = asyncio.ensure_future(self.request(fields))
+        # wait_closed finishes once the transport has lost the connection, not when the client stops sending
+        closed = asyncio.ensure_future(writer.wait_closed())
+        closed.add_done_callback(lambda future : future.cancelled() or future.exception())
+        done, pending = await asyncio.wait([task, closed], return_when = asyncio.FIRST_COMPLETED)
+        if task not in done :
+            task.cancel()
+            writer.close()
+            return
+        closed.cancel()
+        await AsyncSolver.respond(writer, 200, task.result())
+
+    @staticmethod
+    async def respond ( writer, status, answer ) :
+        body = json.dumps(answer).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try :
+            await writer.drain()
+        finally :
+            writer.close()
+
+    async def serve ( self, host = "127.0.0.1", port = 8080 ) :
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def lines ( self, reader, write ) :
+        """
+            Answers JSON requests read one per line, such as {"id": 1, "cube": "R U F'", "deadline": 0.5}, passing every answer to write as a line as soon as it is ready, tagged with the id of its request.
+        """
+        async def answer ( fields ) :
+            try :
+                result = await self.request(fields)
+            except Exception as error :
+                result = {"solution": None, "error": str(error), "elapsed": 0.0}
+            write(json.dumps(dict(result, id = fields.get("id") if isinstance(fields, dict) else None)) + "\n")
+        tasks = []
+        while True :
+            line = await reader()
+            if not line :
+                break
+            if line.strip() :
+                try :
+                    tasks.append(asyncio.ensure_future(answer(json.loads(line))))
+                except ValueError :
+                    write(json.dumps({"solution": None, "error": f"Invalid request: {line.strip()!r}", "elapsed": 0.0, "id": None}) + "\n")
+        await asyncio.gather(*tasks)
+
+async def main ( command, port = 8080, max_time = 10.0 ) :
+    async with AsyncSolver(max_time = max_time) as solver :
+        if command == "http" :
+            server = await solver.serve(port = port)
+            print(f"Serving on {', '.join([str(socket.getsockname()) for socket in server.sockets])}")
+            async with server :
+                await server.serve_forever()
+        else :
+            loop = asyncio.get_running_loop()
+            def write ( line ) :
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            await solver.lines(lambda : loop.run_in_executor(None, sys.stdin.readline), write)
+
+if __name__ == "__main__" :
+    if len(sys.argv) in [2, 3, 4] and sys.argv[1] == "http" :
+        asyncio.run(main("http", *[cast(argument) for cast, argument in zip([int, float], sys.argv[2:])]))
+    elif len(sys.argv) in [2, 3] and sys.argv[1] == "lines" :
+        asyncio.run(main("lines", max_time = float(sys.argv[2]) if len(sys.argv) == 3 else 10.0))
+    else :
+        print(f"Usage: {sys.argv[0]} http [port [max_time]] | lines [max_time]")
+        sys.exit(1)
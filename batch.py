@@ -0,0 +1,173 @@
+import numpy as np
+
+from cube import AlgorithmCache, Cube
+
+class CubeBatch :
+    """
+        A CubeBatch holds many cube states at once as an (N, 26) uint8 array of orientation indices, with the pieces in the same order as repr_orient_str.
+        Because the position of a piece follows from its orientation, the effect of a fixed algorithm on a piece depends only on the piece and its current orientation. Every algorithm is therefore compiled once into a flat 26x24 transition table, and applying it to the whole batch is a single gather.
+    """
+
+    offsets = np.arange(len(Cube.standard_order), dtype=np.intp) * len(Cube.orientations)
+    orient_mul = np.array(Cube.orient_mul, dtype=np.uint8)
+    position_index = np.array(Cube.position_index, dtype=np.intp)
+    symbols = np.frombuffer(Cube.symbols.encode(), dtype=np.uint8)
+    symbol_index = np.frombuffer(Cube.symbol_table, dtype=np.uint8)
+    distance_symbols = np.frombuffer(Cube.distance_table, dtype=np.uint8)
+    # piece_at[position, orientation] is the piece that an orientation brings to a position
+    piece_at = np.zeros((len(Cube.standard_order), len(Cube.orientations)), dtype=np.intp)
+    piece_at[position_index, np.arange(len(Cube.orientations))[None, :]] = np.arange(len(Cube.standard_order))[:, None]
+    transitions = AlgorithmCache(4096)
+
+    def __init__ ( self, states ) :
+        states = np.asarray(states, dtype=np.uint8)
+        if states.ndim != 2 or states.shape[1] != len(Cube.standard_order) :
+            raise Exception(f"Invalid batch shape: {states.shape}")
+        self.states = states
+
+    @classmethod
+    def solved ( cls, count ) :
+        return cls(np.zeros((count, len(Cube.standard_order)), dtype=np.uint8))
+
+    @classmethod
+    def random ( cls, count, seed = None ) :
+        """
+            Draws count uniformly random solvable states, the vectorized form of Scrambler.random_state.
+            Permutations come from sorting random keys, and a batch whose corner and edge parities differ has its first two edges swapped, which keeps the draw uniform.
+        """
+        rng = np.random.default_rng(seed)
+        if not hasattr(cls, "placements") :
+            from cube import Scrambler
+            cls.placements = np.zeros((20, 20, 3), dtype=np.uint8)
+            for piece, placement in enumerate(Scrambler.placements) :
+                for position, orients in placement.items() :
+                    cls.placements[piece, position, :len(orients)] = orients
+        corners = rng.random((count, 8)).argsort(axis=1).astype(np.uint8)
+        edges = rng.random((count, 12)).argsort(axis=1).astype(np.uint8)
+        def parity ( permutation ) :
+            i, j = np.triu_indices(permutation.shape[1], 1)
+            return np.count_nonzero(permutation[:, i] > permutation[:, j], axis=1) & 1
+        swap = parity(corners) != parity(edges)
+        edges[swap, 0], edges[swap, 1] = edges[swap, 1], edges[swap, 0].copy()
+        twists = rng.integers(0, 3, (count, 8))
+        twists[:, 7] = -twists[:, :7].sum(axis=1) % 3
+        flips = rng.integers(0, 2, (count, 12))
+        flips[:, 11] = flips[:, :11].sum(axis=1) % 2
+        states = np.zeros((count, len(Cube.standard_order)), dtype=np.uint8)
+        states[:, :8] = cls.placements[np.arange(8), corners, twists]
+        states[:, 8:20] = cls.placements[np.arange(8, 20), edges + 8, flips]
+        return cls(states)
+
+    @classmethod
+    def from_cubes ( cls, cubes ) :
+        return cls(np.frombuffer(b"".join([cube.orient for cube in cubes]), dtype=np.uint8).reshape(-1, len(Cube.standard_order)))
+
+    @classmethod
+    def from_strings ( cls, strings ) :
+        data = "".join([string.replace(" ", "") for string in strings]).encode()
+        states = cls.symbol_index[np.frombuffer(data, dtype=np.uint8)]
+        if len(states) % len(Cube.standard_order) or (states == 255).any() :
+            raise Exception("Invalid states in batch")
+        return cls(states.reshape(-1, len(Cube.standard_order)))
+
+    @classmethod
+    def from_lines ( cls, data ) :
+        """
+            Decodes newline separated orientation strings, as written by to_lines, from one bytes object; blank lines, spaces and a carriage return before each newline are skipped.
+        """
+        data = np.frombuffer(data, dtype=np.uint8)
+        width = len(Cube.standard_order)
+        if len(data) % (width + 1) == 0 and (data[width::width + 1] == ord("\n")).all() :
+            states = cls.symbol_index[data.reshape(-1, width + 1)[:, :width]]
+        else :
+            states = cls.symbol_index[data[~np.isin(data, np.frombuffer(b" \r\n", dtype=np.uint8))]]
+            if len(states) % width :
+                raise Exception("Invalid states in batch")
+            states = states.reshape(-1, width)
+        if (states == 255).any() :
+            raise Exception("Invalid states in batch")
+        return cls(states)
+
+    @classmethod
+    def from_inv_strings ( cls, strings ) :
+        """
+            Decodes strings in the form of repr_inv_orient_str, which list the orientation found at every position rather than for every piece.
+        """
+        at = cls.from_strings(strings).states
+        rows = np.arange(len(at))[:, None]
+        states = np.full(at.shape, 255, dtype=np.uint8)
+        states[rows, cls.piece_at[np.arange(at.shape[1])[None, :], at]] = at
+        if (states == 255).any() :
+            raise Exception("Invalid states in batch; two positions hold the same piece")
+        return cls(states)
+
+    def to_inv_strings ( self ) :
+        at = np.zeros(self.states.shape, dtype=np.uint8)
+        at[np.arange(len(self.states))[:, None], CubeBatch.position_index[np.arange(self.states.shape[1])[None, :], self.states]] = CubeBatch.symbols[self.states]
+        if (at == 0).any() :
+            raise Exception("Invalid states in batch; two pieces share a position")
+        return CubeBatch.split(at)
+
+    def to_distance_strings ( self ) :
+        return CubeBatch.split(CubeBatch.distance_symbols[self.states])
+
+    @staticmethod
+    def split ( symbols ) :
+        data = symbols.tobytes().decode()
+        width = len(Cube.standard_order)
+        return [data[i:i+width] for i in range(0, len(data), width)]
+
+    def to_cubes ( self ) :
+        data = self.states.tobytes()
+        width = len(Cube.standard_order)
+        return [Cube("", data[i:i+width]) for i in range(0, len(data), width)]
+
+    def to_strings ( self ) :
+        return CubeBatch.split(CubeBatch.symbols[self.states])
+
+    def to_lines ( self ) :
+        """
+            The orientation strings of the batch as newline terminated ASCII lines, in a single bytes object.
+        """
+        lines = np.full((len(self.states), len(Cube.standard_order) + 1), ord("\n"), dtype=np.uint8)
+        lines[:, :-1] = CubeBatch.symbols[self.states]
+        return lines.tobytes()
+
+    @classmethod
+    def transition ( cls, other ) :
+        """
+            Returns the flat transition table of an algorithm name, algorithm string or Cube; entry piece*24 + orientation holds the orientation that piece ends up in.
+            Tables are kept in a bounded least recently used cache, like compiled algorithms, so arbitrary inputs cannot grow it without limit.
+        """
+        key = other.repr_orient_str() if isinstance(other, Cube) else other
+        table = cls.transitions.get(key)
+        if table is None :
+            if isinstance(other, Cube) :
+                move = other
+            elif other in Cube.algorithms :
+                move = Cube() * Cube.algorithms[other]
+            else :
+                move = Cube() * other
+            rotation = np.frombuffer(move.orient, dtype=np.uint8).astype(np.intp)[cls.position_index]
+            table = cls.orient_mul[np.arange(len(Cube.orientations))[None, :], rotation].ravel()
+            cls.transitions.put(key, table)
+        return table
+
+    def apply ( self, other ) :
+        """
+            Applies an entry of Cube.algorithms, an algorithm string or a Cube to every state in place.
+        """
+        table = CubeBatch.transition(other)
+        self.states = table[self.states + CubeBatch.offsets]
+        return self
+
+    def __mul__ ( self, other ) :
+        return CubeBatch(self.states).apply(other)
+
+    def __len__ ( self ) :
+        return len(self.states)
+
+    def __getitem__ ( self, index ) :
+        if isinstance(index, slice) :
+            return CubeBatch(self.states[index])
+        return Cube("", self.states[index].tobytes())
@@ -0,0 +1,212 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from cube import AlgorithmCache, Cube, Scrambler, Solver
+
+class Benchmark :
+    """
+        A Benchmark times one hot path over a fixed workload.
+        The workload is built from a seeded random generator before timing starts, and the body is run repeat times, keeping the fastest run, so numbers from the same machine can be compared between commits.
+        Every result holds seconds per operation; benchmarks that count work, like search nodes, add those counts as well, and since they do not depend on the machine any increase is a regression.
+    """
+
+    registry = []
+
+    def __init__ ( self, name, setup, ops ) :
+        self.name = name
+        self.setup = setup
+        self.ops = ops
+
+    @classmethod
+    def register ( cls, name, ops ) :
+        def decorator ( setup ) :
+            cls.registry.append(Benchmark(name, setup, ops))
+            return setup
+        return decorator
+
+    def run ( self, seed, repeat, scale ) :
+        ops = max(1, int(self.ops * scale))
+        best = None
+        counts = {}
+        for i in range(repeat) :
+            body = self.setup(random.Random(seed), ops)
+            start = time.perf_counter()
+            counts = body() or {}
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return {"ops": ops, "seconds": best, "seconds_per_op": best / ops, **counts}
+
+def random_moves ( rng, length ) :
+    return [rng.choice(Solver.moves) for i in range(length)]
+
+@Benchmark.register("mul_single_move", 20000)
+def bench_mul_single_move ( rng, ops ) :
+    # Chains of 100 moves, as the hist of a cube grows with every multiplication
+    moves = [Cube.compile("a: " + move) for move in random_moves(rng, ops)]
+    def body ( ) :
+        for i in range(0, len(moves), 100) :
+            cube = Cube()
+            for move in moves[i:i+100] :
+                cube = cube * move
+    return body
+
+@Benchmark.register("mul_lazy_chain", 20000)
+def bench_mul_lazy_chain ( rng, ops ) :
+    # One chain of every move, observed once at the end
+    moves = ["a: " + move for move in random_moves(rng, ops)]
+    def body ( ) :
+        cube = Cube().lazy()
+        for move in moves :
+            cube = cube * move
+        cube.repr_orient_str()
+    return body
+
+@Benchmark.register("mul_long_algorithm", 20000)
+def bench_mul_long_algorithm ( rng, ops ) :
+    algorithms = [Cube.compile("a: " + " ".join(random_moves(rng, 200))) for i in range(4)]
+    def body ( ) :
+        for i in range(ops) :
+            Cube() * algorithms[i % len(algorithms)]
+    return body
+
+@Benchmark.register("parse_cold_cache", 500)
+def bench_parse_cold_cache ( rng, ops ) :
+    algorithms = ["a: " + " ".join(random_moves(rng, 20)) for i in range(ops)]
+    def body ( ) :
+        # Compiles into a private empty cache, so the shared one stays warm for the benchmarks that follow
+        cache = Cube.static_cache
+        Cube.static_cache = AlgorithmCache(cache.maxsize)
+        try :
+            for algorithm in algorithms :
+                Cube.compile(algorithm)
+        finally :
+            Cube.static_cache = cache
+    return body
+
+@Benchmark.register("parse_warm_cache", 20000)
+def bench_parse_warm_cache ( rng, ops ) :
+    algorithms = ["a: " + " ".join(random_moves(rng, 20)) for i in range(64)]
+    for algorithm in algorithms :
+        Cube.compile(algorithm)
+    def body ( ) :
+        for i in range(ops) :
+            Cube.compile(algorithms[i % len(algorithms)])
+    return body
+
+@Benchmark.register("repr_orient_str", 20000)
+def bench_repr_orient_str ( rng, ops ) :
+    cubes = [Cube() * ("a: " + " ".join(random_moves(rng, 20))) for i in range(64)]
+    def body ( ) :
+        for i in range(ops) :
+            cubes[i % len(cubes)].repr_orient_str()
+    return body
+
+@Benchmark.register("repr_inv_orient_str", 20000)
+def bench_repr_inv_orient_str ( rng, ops ) :
+    cubes = [Cube() * ("a: " + " ".join(random_moves(rng, 20))) for i in range(64)]
+    def body ( ) :
+        for i in range(ops) :
+            cubes[i % len(cubes)].repr_inv_orient_str()
+    return body
+
+@Benchmark.register("scrambler_new", 2000)
+def bench_scrambler_new ( rng, ops ) :
+    scrambler = Scrambler(seed = rng.getrandbits(32))
+    def body ( ) :
+        for i in range(ops) :
+            scrambler.new()
+    return body
+
+@Benchmark.register("scrambler_random_state", 20000)
+def bench_scrambler_random_state ( rng, ops ) :
+    scrambler = Scrambler(seed = rng.getrandbits(32))
+    def body ( ) :
+        for cube in scrambler.stream(ops) :
+            pass
+    return body
+
+@Benchmark.register("solve_ida", 10)
+def bench_solve_ida ( rng, ops ) :
+    cubes = [Cube() * ("a: " + " ".join(random_moves(rng, 5))) for i in range(ops)]
+    def body ( ) :
+        nodes = 0
+        length = 0
+        for cube in cubes :
+            solver = Solver(cube)
+            length += len(solver.solve())
+            nodes += solver.nodes
+        return {"nodes": nodes, "moves": length}
+    return body
+
+@Benchmark.register("solve_cfop", 200)
+def bench_solve_cfop ( rng, ops ) :
+    cubes = list(Scrambler(seed = rng.getrandbits(32)).stream(ops))
+    Solver(cubes[0]).solve_cfop()
+    def body ( ) :
+        length = 0
+        for cube in cubes :
+            length += len(Solver(cube).solve_cfop())
+        return {"moves": length}
+    return body
+
+@Benchmark.register("nxn_7x7_move", 20000)
+def bench_nxn_7x7_move ( rng, ops ) :
+    from nxn import NxN
+    puzzle = NxN.of(7)
+    moves = [[rng.choice(["", "2", "3"]) + move] for move in random_moves(rng, ops)]
+    puzzle.apply(puzzle.solved, "R 2R 3R")
+    def body ( ) :
+        state = puzzle.solved
+        for move in moves :
+            state = puzzle.apply(state, move)
+    return body
+
+def run ( names = None, seed = 0, repeat = 3, scale = 1.0 ) :
+    benchmarks = [benchmark for benchmark in Benchmark.registry if not names or benchmark.name in names]
+    return {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "seed": seed, "repeat": repeat, "scale": scale, "time": time.time()},
+        "results": {benchmark.name: benchmark.run(seed, repeat, scale) for benchmark in benchmarks},
+    }
+
+def compare ( baseline, current, threshold = 0.1 ) :
+    """
+        Lists the regressions of current against baseline: every benchmark whose time per operation grew by more than threshold, and every count that grew at all.
+    """
+    regressions = []
+    for name, result in current["results"].items() :
+        if name not in baseline["results"] :
+            continue
+        before = baseline["results"][name]
+        if result["seconds_per_op"] > before["seconds_per_op"] * (1 + threshold) :
+            regressions.append(f"{name}: {before['seconds_per_op']*1e6:.2f}us -> {result['seconds_per_op']*1e6:.2f}us per op ({result['seconds_per_op'] / before['seconds_per_op'] - 1:+.0%})")
+        for key in ["nodes", "moves"] :
+            if key in result and key in before and result[key] > before[key] :
+                regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+    return regressions
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Benchmarks the hot paths of the cube engine and prints the results as JSON.")
+    parser.add_argument("names", nargs = "*", help = "benchmarks to run, all by default: " + ", ".join([benchmark.name for benchmark in Benchmark.registry]))
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--scale", type = float, default = 1.0, help = "multiplies the workload of every benchmark")
+    parser.add_argument("--output", help = "writes the results to this file instead of stdout")
+    parser.add_argument("--compare", metavar = "BASELINE", help = "compares against a stored result and exits with 1 on regressions")
+    parser.add_argument("--threshold", type = float, default = 0.1, help = "allowed slowdown before a benchmark counts as a regression")
+    args = parser.parse_args()
+    results = run(args.names, args.seed, args.repeat, args.scale)
+    if args.output :
+        with open(args.output, "w") as file :
+            json.dump(results, file, indent = 2)
+    else :
+        print(json.dumps(results, indent = 2))
+    if args.compare :
+        with open(args.compare) as file :
+            regressions = compare(json.load(file), results, args.threshold)
+        for regression in regressions :
+            print(f"REGRESSION {regression}", file = sys.stderr)
+        sys.exit(1 if regressions else 0)
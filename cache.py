@@ -0,0 +1,176 @@
+import sqlite3
+import threading
+import time
+
+from cube import Cube, Solver
+
+class SolutionCache :
+    """
+        A SolutionCache is a persistent, size-bounded map from cube states to known solutions, kept in an SQLite database in WAL mode, so any number of processes can read it while one writes.
+        States are keyed by Cube.canonical of the state with its centers untwisted, under the 48 symmetries and, when inverse is set, inversion as well, so one entry answers for up to 96 states; the stored solution solves the key and is mapped back through the symmetry and inversion on the way out.
+        Once the table holds more than max_entries rows, the least recently used rows are dropped, or the least frequently used with policy "lfu". Hits are counted in memory and written back with the next write, so a lookup never waits on the database lock.
+        The entries the policy values most are loaded into memory at startup, and every entry read or written since is kept there too, so repeated states are answered without touching the database at all. The states answered last are remembered as they were asked, which skips the 96 candidate keys of canonical for the same state asked again.
+    """
+
+    policies = {"lru": "used", "lfu": "hits, used"}
+
+    def __init__ ( self, path, max_entries = 1 << 20, policy = "lru", inverse = True, memory = 1 << 16, timeout = 30.0 ) :
+        if policy not in SolutionCache.policies :
+            raise Exception(f"Invalid policy: {policy}; expected one of {list(SolutionCache.policies)}")
+        self.path = path
+        self.max_entries = max_entries
+        self.policy = policy
+        self.inverse = inverse
+        self.capacity = memory
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout = timeout, check_same_thread = False, isolation_level = None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS solutions (key BLOB PRIMARY KEY, solution TEXT NOT NULL, hits INTEGER NOT NULL DEFAULT 0, used REAL NOT NULL) WITHOUT ROWID")
+        self.connection.execute(f"CREATE INDEX IF NOT EXISTS solutions_{policy} ON solutions ({SolutionCache.policies[policy]})")
+        self.memory = {}
+        self.states = {}
+        self.touched = {}
+        self.size = self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.warm()
+
+    def __enter__ ( self ) :
+        return self
+
+    def __exit__ ( self, *args ) :
+        self.close()
+
+    def __len__ ( self ) :
+        return self.size
+
+    def close ( self ) :
+        with self.lock :
+            if self.connection is not None :
+                self.flush()
+                self.connection.close()
+                self.connection = None
+
+    def warm ( self ) :
+        """
+            Loads the entries the eviction policy would keep longest into memory.
+        """
+        order = ", ".join([column + " DESC" for column in SolutionCache.policies[self.policy].split(", ")])
+        for key, solution in self.connection.execute(f"SELECT key, solution FROM solutions ORDER BY {order} LIMIT ?", (self.capacity,)) :
+            self.memory[key] = solution.split()
+
+    @staticmethod
+    def untwisted ( cube ) :
+        """
+            The cube with its centers untwisted, or None when they are not in place; face turn solutions cannot depend on how the centers are turned.
+        """
+        for center in range(20, len(Cube.standard_order)) :
+            if Cube.position_index[center][cube.orient[center]] != center :
+                return None
+        return Cube("", cube.orient[:20] + bytes(len(Cube.standard_order) - 20))
+
+    def key ( self, cube ) :
+        cube = SolutionCache.untwisted(cube)
+        if cube is None :
+            return None
+        return cube.canonical(self.inverse)
+
+    def touch ( self, key ) :
+        self.hits += 1
+        hits, used = self.touched.get(key, (0, 0.0))
+        self.touched[key] = (hits + 1, time.time())
+
+    @staticmethod
+    def transform ( moves, sym, inverted ) :
+        """
+            Maps a solution of the key back to a solution of the state it was found for.
+        """
+        moves = Solver.conjugate_moves(moves, Solver.symmetry_inverse[sym])
+        return Solver.invert_moves(moves) if inverted else moves
+
+    def get ( self, cube ) :
+        """
+            Returns a known solution of the cube as a list of face turns, or None.
+        """
+        cube = SolutionCache.untwisted(cube)
+        if cube is None :
+            return None
+        known = self.states.get(cube.orient)
+        # The answer stands as long as memory still holds the same solution of its key
+        if known is not None and self.memory.get(known[0]) is known[1] :
+            self.touch(known[0])
+            return list(known[2])
+        key, sym, inverted = cube.canonical(self.inverse)
+        moves = self.memory.get(key)
+        if moves is None :
+            with self.lock :
+                row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is None :
+                self.misses += 1
+                return None
+            moves = self.remember(key, row[0].split())
+        self.touch(key)
+        if len(self.states) >= self.capacity :
+            del self.states[next(iter(self.states))]
+        self.states[cube.orient] = (key, moves, SolutionCache.transform(moves, sym, inverted))
+        return list(self.states[cube.orient][2])
+
+    def remember ( self, key, moves ) :
+        if len(self.memory) >= self.capacity :
+            del self.memory[next(iter(self.memory))]
+        self.memory[key] = moves
+        return moves
+
+    def put ( self, cube, moves ) :
+        """
+            Stores a face turn solution of the cube, unless a solution at least as short is known already.
+        """
+        if any([move not in Solver.symmetry_moves[0] for move in moves]) :
+            raise Exception(f"Invalid solution: {' '.join(moves)!r}; only face turns can be cached")
+        found = self.key(cube)
+        if found is None :
+            return
+        key, sym, inverted = found
+        # Undo transform: the moves solve the state, so the inverted moves solve its inverse, and conjugating either by sym solves the key
+        moves = Solver.conjugate_moves(Solver.invert_moves(moves) if inverted else moves, sym)
+        known = self.memory.get(key)
+        if known is not None and len(known) <= len(moves) :
+            return
+        with self.lock :
+            # One write transaction for the row, the pending hits and any eviction; other processes keep reading the last commit meanwhile
+            self.connection.execute("BEGIN IMMEDIATE")
+            try :
+                row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+                if row is None or len(row[0].split()) > len(moves) :
+                    self.connection.execute("INSERT OR REPLACE INTO solutions (key, solution, hits, used) VALUES (?, ?, 0, ?)", (key, " ".join(moves), time.time()))
+                    self.size += row is None
+                else :
+                    moves = row[0].split()
+                self.flush()
+                if self.size > self.max_entries :
+                    self.evict()
+                self.connection.execute("COMMIT")
+            except BaseException :
+                self.connection.execute("ROLLBACK")
+                raise
+            self.remember(key, moves)
+
+    def flush ( self ) :
+        if not self.touched :
+            return
+        touched, self.touched = self.touched, {}
+        self.connection.executemany("UPDATE solutions SET hits = hits + ?, used = max(used, ?) WHERE key = ?", [(hits, used, key) for key, (hits, used) in touched.items()])
+
+    def evict ( self ) :
+        """
+            Drops the rows the policy values least, down to nine tenths of max_entries so that eviction runs once per many writes.
+        """
+        self.size = self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        excess = self.size - self.max_entries * 9 // 10
+        if excess <= 0 :
+            return
+        evicted = [row[0] for row in self.connection.execute(f"DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY {SolutionCache.policies[self.policy]} LIMIT ?) RETURNING key", (excess,))]
+        for key in evicted :
+            self.memory.pop(key, None)
+        self.size -= len(evicted)
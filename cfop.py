@@ -0,0 +1,183 @@
+import heapq
+
+from cube import Cube, Solver
+from optimize import Optimizer
+
+class LastLayer :
+    """
+        A LastLayer index recognizes the OLL and PLL case of a cube whose first two layers are solved, and hands back the moves that solve it, in one dict lookup.
+        It is built by running every algorithm backwards, after each of the four pre-AUF turns, from the states already known, starting at the solved cube; the state reached is then solved by that AUF, the algorithm, and whatever solved the state it started from. Cases that no single algorithm solves are reached in the following rounds, so the index covers every case with the fewest algorithms the set allows.
+        PLL cases are keyed by the packed orientation substring of the eight last layer pieces, which pins down their permutation, and start from the four post-AUF turns. OLL cases ignore the permutation, so they are keyed by the twist and flip found at each last layer position instead.
+    """
+
+    corners = [0, 1, 2, 3]
+    edges = [8, 9, 10, 11]
+    aufs = [[], ["U"], ["U'"], ["U2"]]
+
+    oll_names = [name for name in Cube.algorithms if name.startswith("OLL-")]
+    oll_2_look_names = ["OLL-Dot", "OLL-I-Shape", "OLL-L=Shape", "OLL-Sune", "OLL-Antisune", "OLL-H", "OLL-L", "OLL-Pi", "OLL-T", "OLL-U"]
+    pll_names = [name for name in Cube.algorithms if name.startswith("PLL-")]
+
+    def __init__ ( self, names, key, starts ) :
+        self.key = key
+        # Algorithms are stored as plain face turns; some end in a rotation, which is dropped with the optimizer
+        self.algorithms = {name: [move for move in Optimizer().optimize(Cube.algorithms[name]) if move[0] in Solver.faces] for name in names}
+        steps = [(auf + algorithm, (Cube() * ("a: " + " ".join(auf + algorithm))).inverse()) for auf in LastLayer.aufs for algorithm in self.algorithms.values()]
+        self.index = {}
+        layer = []
+        for auf in starts :
+            state = (Cube() * ("a: " + " ".join(auf))).inverse()
+            if key(state) not in self.index :
+                self.index[key(state)] = auf
+                layer.append((state, auf))
+        while layer :
+            found = {}
+            for state, moves in layer :
+                for step, inverse in steps :
+                    following = state * inverse
+                    k = key(following)
+                    if k not in self.index and (k not in found or len(step) + len(moves) < len(found[k][1])) :
+                        found[k] = (following, step + moves)
+            for k, (state, moves) in found.items() :
+                self.index[k] = moves
+            layer = list(found.values())
+
+    def __len__ ( self ) :
+        return len(self.index)
+
+    def lookup ( self, cube ) :
+        moves = self.index.get(self.key(cube))
+        if moves is None :
+            raise Exception(f"Invalid last layer: {cube.repr_orient_str()}; the first two layers are not solved")
+        return list(moves)
+
+    @staticmethod
+    def oll_key ( cube ) :
+        twists = [0]*8
+        for piece in LastLayer.corners + LastLayer.edges :
+            position = Cube.position_index[piece][cube.orient[piece]]
+            if position in LastLayer.corners :
+                twists[position] = Cube.twist_index[piece][cube.orient[piece]]
+            elif position in LastLayer.edges :
+                twists[position - 4] = Cube.twist_index[piece][cube.orient[piece]]
+            else :
+                return None
+        return bytes(twists)
+
+    @staticmethod
+    def pll_key ( cube ) :
+        return bytes([cube.orient[piece] for piece in LastLayer.corners + LastLayer.edges])
+
+LastLayer.oll = LastLayer(LastLayer.oll_names, LastLayer.oll_key, [[]])
+LastLayer.oll_2_look = LastLayer(LastLayer.oll_2_look_names, LastLayer.oll_key, [[]])
+LastLayer.pll = LastLayer(LastLayer.pll_names, LastLayer.pll_key, LastLayer.aufs)
+
+class CFOP :
+    """
+        Solves a cube the way people do: the cross on the bottom, the four corner and edge pairs of the first two layers, then OLL and PLL from the LastLayer index.
+        The cross is solved optimally by walking down a PatternDatabase of the four cross edges, which holds the exact distance of every cross state.
+        Pairs are solved from a table of the front right slot, found with a shortest path search over the U turns and the six three-move inserts R U R', F' U' F and friends; these only touch the U layer and the front right slot, so they never disturb the cross or the other slots. The other slots are solved by looking at the cube from behind a y rotation, and a pair stuck in the wrong slot is first taken out with an insert of that slot.
+    """
+
+    cross = ["YG", "YB", "YO", "YR"]
+    slot = [Cube.piece_index["YGR"], Cube.piece_index["GR"]]
+    inserts = [["U"], ["U'"], ["U2"], ["R", "U", "R'"], ["R", "U'", "R'"], ["R", "U2", "R'"], ["F'", "U", "F"], ["F'", "U'", "F"], ["F'", "U2", "F"]]
+    views = []
+    cross_database = None
+
+    @classmethod
+    def compile_pairs ( cls ) :
+        """
+            pairs maps the orientations of the front right corner and edge onto the shortest sequence of inserts that solves them; views holds the four y rotations that bring each slot to the front right.
+        """
+        inserts = [(insert, Cube.compile("a: " + " ".join(insert)).orient) for insert in cls.inserts]
+        def apply ( key, orient ) :
+            return tuple([Cube.orient_mul[o][orient[Cube.position_index[piece][o]]] for piece, o in zip(cls.slot, key)])
+        cls.pairs = {(0, 0): []}
+        queue = [(0, 0, (0, 0))]
+        while queue :
+            cost, order, key = heapq.heappop(queue)
+            if cost > len(cls.pairs[key]) :
+                continue
+            for i, (insert, orient) in enumerate(inserts) :
+                following = apply(key, orient)
+                moves = Solver.invert_moves(insert) + cls.pairs[key]
+                if following not in cls.pairs or len(moves) < len(cls.pairs[following]) :
+                    cls.pairs[following] = moves
+                    heapq.heappush(queue, (len(moves), len(cls.pairs), following))
+        y = Cube.compile("a: y").orient[0]
+        cls.views = [0]
+        while len(cls.views) < 4 :
+            cls.views.append(Cube.orient_mul[cls.views[-1]][y])
+
+    @classmethod
+    def recenter ( cls, cube ) :
+        """
+            The rotation that brings every center home, as a list of x, y and z turns.
+        """
+        for rotation, moves in Optimizer.rotation_names.items() :
+            if all([Cube.position_index[piece][Cube.orient_mul[o][rotation]] == piece for piece, o in zip(range(20, len(Cube.standard_order)), cube.orient[20:])]) :
+                return list(moves)
+        raise Exception(f"Invalid state: {cube.repr_orient_str()}; the centers cannot be brought home")
+
+    @classmethod
+    def solve_cross ( cls, cube ) :
+        if cls.cross_database is None :
+            from pattern import PatternDatabase
+            cls.cross_database = PatternDatabase.build(cls.cross)
+        database = cls.cross_database
+        moves = []
+        orient = cube.orient
+        distance = database.lookup(orient)
+        while distance :
+            for move, move_orient in zip(Solver.moves, Solver.move_orients) :
+                following = Cube.compose(orient, move_orient)
+                if database.lookup(following) < distance :
+                    moves.append(move)
+                    orient = following
+                    distance -= 1
+                    break
+        return moves
+
+    @classmethod
+    def pair_keys ( cls, cube ) :
+        keys = []
+        for view in cls.views :
+            seen = cube.conjugate(view)
+            keys.append(tuple([seen.orient[piece] for piece in cls.slot]))
+        return keys
+
+    @classmethod
+    def solve_f2l ( cls, cube ) :
+        moves = []
+        for attempt in range(16) :
+            keys = CFOP.pair_keys(cube)
+            unsolved = [(view, key) for view, key in zip(cls.views, keys) if key != (0, 0)]
+            if not unsolved :
+                return moves
+            known = [(len(cls.pairs[key]), i, view, key) for i, (view, key) in enumerate(unsolved) if key in cls.pairs]
+            if known :
+                length, i, view, key = min(known)
+                step = Solver.conjugate_moves(cls.pairs[key], Cube.orientation_inverse[view])
+            else :
+                # Every pair has a piece stuck in another slot; take it out with an insert of a slot that is not solved either
+                extractions = [Solver.conjugate_moves(cls.inserts[3], Cube.orientation_inverse[view]) for view, key in unsolved]
+                step = next((step for step in extractions if any([key != (0, 0) and key in cls.pairs for key in CFOP.pair_keys(cube * ("a: " + " ".join(step)))])), extractions[0])
+            cube = cube * ("a: " + " ".join(step))
+            moves += step
+        raise Exception(f"Invalid state: {cube.repr_orient_str()}; the pairs could not be solved")
+
+    @classmethod
+    def solve ( cls, cube, two_look = False ) :
+        """
+            Returns the moves of every stage, as a list of (stage, moves) pairs.
+        """
+        stages = []
+        for stage, solve in [("recenter", cls.recenter), ("cross", cls.solve_cross), ("f2l", cls.solve_f2l), ("oll", (LastLayer.oll_2_look if two_look else LastLayer.oll).lookup), ("pll", LastLayer.pll.lookup)] :
+            moves = solve(cube)
+            if moves :
+                cube = cube * ("a: " + " ".join(moves))
+            stages.append((stage, moves))
+        return stages
+
+CFOP.compile_pairs()
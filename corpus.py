@@ -0,0 +1,186 @@
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from cube import Cube, Scrambler
+from batch import CubeBatch
+
+class Corpus :
+    """
+        A Corpus is a read-only, memory-mapped file of cube states, optionally with the move sequence that produced each of them.
+        The file starts with a 64 byte header, followed by one 26 byte record of orientation indices per state, in the piece order of repr_orient_str. When moves are attached, the records are followed by count + 1 little-endian uint64 offsets, aligned to 8 bytes, and the space separated move text they point into.
+        Nothing is parsed on load: states hands out the records as a zero-copy (N, 26) NumPy view, and indexing builds a Cube from its record only when it is asked for.
+    """
+
+    magic = b"RCSC"
+    version = 1
+    header = struct.Struct("<4sIIIQQ32x")
+    width = len(Cube.standard_order)
+
+    def __init__ ( self, path ) :
+        self.path = path
+        with open(path, "rb") as file :
+            self.data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        if len(self.data) < Corpus.header.size :
+            raise Exception(f"Invalid corpus: {path}")
+        magic, version, width, flags, self.count, moves = Corpus.header.unpack_from(self.data)
+        if magic != Corpus.magic or version != Corpus.version or width != Corpus.width :
+            raise Exception(f"Invalid corpus: {path}")
+        end = Corpus.header.size + self.count * width
+        if len(self.data) < end or (moves and len(self.data) < moves + 8 * (self.count + 1)) :
+            raise Exception(f"Invalid corpus: {path}; expected {self.count} records")
+        self.states = np.frombuffer(self.data, dtype=np.uint8, count = self.count * width, offset = Corpus.header.size).reshape(self.count, width)
+        self.offsets = np.frombuffer(self.data, dtype="<u8", count = self.count + 1, offset = moves) if moves else None
+        self.text = moves + 8 * (self.count + 1)
+
+    def __len__ ( self ) :
+        return self.count
+
+    def __getitem__ ( self, index ) :
+        if index < 0 :
+            index += self.count
+        if not 0 <= index < self.count :
+            raise IndexError(f"Invalid index: {index} of {self.count}")
+        start = Corpus.header.size + index * Corpus.width
+        cube = Cube("", self.data[start:start + Corpus.width])
+        if self.offsets is not None :
+            cube.hist = tuple(self.moves(index))
+            cube.name = "a: " + " ".join(cube.hist)
+        return cube
+
+    def __iter__ ( self ) :
+        for index in range(self.count) :
+            yield self[index]
+
+    def moves ( self, index ) :
+        if self.offsets is None :
+            return None
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return self.data[self.text + start:self.text + end].decode().split()
+
+    def batch ( self, start = 0, stop = None ) :
+        """
+            The records from start to stop as a CubeBatch that shares memory with the file; apply returns new arrays, so the file is never written.
+        """
+        return CubeBatch(self.states[start:stop])
+
+    def chunks ( self, size = 65536 ) :
+        """
+            Yields (start, states) for consecutive zero-copy slices of at most size records, for pipelines that work a chunk at a time.
+        """
+        for start in range(0, self.count, size) :
+            yield start, self.states[start:start + size]
+
+    @staticmethod
+    def write ( path, states, moves = None ) :
+        """
+            Writes a corpus in one go from an (N, 26) array, a CubeBatch, or an iterable of Cubes, with an optional list of move sequences.
+        """
+        with CorpusWriter(path, moves is not None) as writer :
+            if isinstance(states, CubeBatch) :
+                states = states.states
+            if isinstance(states, np.ndarray) :
+                writer.extend(states, moves)
+            else :
+                for i, cube in enumerate(states) :
+                    writer.append(cube, None if moves is None else moves[i])
+        return Corpus(path)
+
+    @staticmethod
+    def convert ( source, path, chunk = 65536 ) :
+        """
+            Converts a text file of orientation strings, one per line as written by Scrambler.write, into a corpus, chunk lines at a time.
+        """
+        with open(source) as file, CorpusWriter(path) as writer :
+            lines = []
+            for line in file :
+                if line.strip() :
+                    lines.append(line.strip())
+                if len(lines) == chunk :
+                    writer.extend(CubeBatch.from_strings(lines).states)
+                    lines = []
+            if lines :
+                writer.extend(CubeBatch.from_strings(lines).states)
+        return Corpus(path)
+
+class CorpusWriter :
+    """
+        A CorpusWriter streams records into a new corpus file; the move text is spooled to a temporary file and appended when the writer is closed, together with the final count in the header.
+    """
+
+    def __init__ ( self, path, with_moves = False ) :
+        self.file = open(path, "wb")
+        self.file.write(bytes(Corpus.header.size))
+        self.count = 0
+        self.with_moves = with_moves
+        self.offsets = [0] if with_moves else None
+        self.text = tempfile.TemporaryFile() if with_moves else None
+
+    def __enter__ ( self ) :
+        return self
+
+    def __exit__ ( self, *args ) :
+        self.close()
+
+    def add_moves ( self, moves ) :
+        if not self.with_moves :
+            if moves is not None :
+                raise Exception("Invalid moves: this corpus was opened without moves")
+            return
+        text = " ".join(moves or []).encode()
+        self.text.write(text)
+        self.offsets.append(self.offsets[-1] + len(text))
+
+    def append ( self, cube, moves = None ) :
+        orient = cube.orient if isinstance(cube, Cube) else bytes(cube)
+        if len(orient) != Corpus.width :
+            raise Exception(f"Invalid state: {orient!r}")
+        if moves is None and self.with_moves and isinstance(cube, Cube) :
+            moves = cube.hist
+        self.file.write(orient)
+        self.add_moves(moves)
+        self.count += 1
+
+    def extend ( self, states, moves = None ) :
+        states = np.ascontiguousarray(states, dtype=np.uint8)
+        if states.ndim != 2 or states.shape[1] != Corpus.width :
+            raise Exception(f"Invalid batch shape: {states.shape}")
+        if moves is not None and len(moves) != len(states) :
+            raise Exception(f"Invalid moves: {len(moves)} sequences for {len(states)} states")
+        self.file.write(states.tobytes())
+        if self.with_moves or moves is not None :
+            for i in range(len(states)) :
+                self.add_moves(None if moves is None else moves[i])
+        self.count += len(states)
+
+    def close ( self ) :
+        if self.file.closed :
+            return
+        moves = 0
+        if self.with_moves :
+            self.file.write(bytes(-self.file.tell() % 8))
+            moves = self.file.tell()
+            self.file.write(np.array(self.offsets, dtype="<u8").tobytes())
+            self.text.seek(0)
+            shutil.copyfileobj(self.text, self.file)
+            self.text.close()
+        self.file.seek(0)
+        self.file.write(Corpus.header.pack(Corpus.magic, Corpus.version, Corpus.width, int(self.with_moves), self.count, moves))
+        self.file.close()
+
+if __name__ == "__main__" :
+    if len(sys.argv) == 4 and sys.argv[1] == "convert" :
+        print(f"{len(Corpus.convert(sys.argv[2], sys.argv[3]))} states")
+    elif len(sys.argv) in [4, 5] and sys.argv[1] == "random" :
+        scrambler = Scrambler(seed = int(sys.argv[4]) if len(sys.argv) == 5 else None)
+        with CorpusWriter(sys.argv[3]) as writer :
+            for start in range(0, int(sys.argv[2]), 65536) :
+                writer.extend(CubeBatch.random(min(65536, int(sys.argv[2]) - start), scrambler.random.getrandbits(64)).states)
+        print(f"{writer.count} states")
+    else :
+        print(f"Usage: {sys.argv[0]} convert text_path corpus_path | random count corpus_path [seed]")
+        sys.exit(1)
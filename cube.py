@@ -1,10 +1,64 @@
+import collections
+import logging
 import math
+import operator
 import random
+import time
+
+import metrics
+
+log = logging.getLogger("cube")
+
+class InvalidAlgorithm ( Exception ) :
+    pass
+
+class AlgorithmCache :
+    """
+        A size-bounded least recently used cache of compiled algorithms, keyed by algorithm string, that counts its hits and misses.
+    """
+
+    def __init__ ( self, maxsize = 4096 ) :
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get ( self, key ) :
+        entry = self.entries.get(key)
+        if entry is None :
+            self.misses += 1
+        else :
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put ( self, key, value ) :
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize :
+            self.entries.popitem(last = False)
+
+    def clear ( self ) :
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats ( self ) :
+        return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __contains__ ( self, key ) :
+        return key in self.entries
+
+    def __getitem__ ( self, key ) :
+        return self.entries[key]
+
+    def __len__ ( self ) :
+        return len(self.entries)
 
 class Cube :
     """
         A Cube is an arbitrarily sized cube of pieces.
-        The state of the cube can be expressed as a full nested matrix of positions, holding the piece and orientation. Because the position of a piece can be determined by its orientation, it is possible to express the entire state of the cube as a single string of rotation letters. All 24 axis aligned rotations can be represented by a single letter, or using the two letter notation of the top and front face colors relative to the root white-green color. This is internally kept as a dictionary of piece names to rotation operations, as to not be tied to a specific order of pieces.
+        The state of the cube can be expressed as a full nested matrix of positions, holding the piece and orientation. Because the position of a piece can be determined by its orientation, it is possible to express the entire state of the cube as a single string of rotation letters. All 24 axis aligned rotations can be represented by a single letter, or using the two letter notation of the top and front face colors relative to the root white-green color. Internally the state is kept as orient, 26 immutable bytes holding the index of the orientation of every piece in standard_order. A Cube can still be built from a dictionary of piece names to rotation operations, and the state property converts to and from that form on demand; it builds a new dictionary every time, so changing it does not change the cube.
 
         The configuration of the Cube can be seen as a point within a group. Moves acting as transformations on the Cube give us other points within this group. Transformations are closed under composition, not cummutative, and every state is itself a transformation. Transformations move the state within a cyclic statespace, meaning that all states are trivially invertible and some root of the identity state, which we can arbitrarily assign to the "solved" state for convenience.
 
@@ -163,6 +217,9 @@ class Cube :
         "l" : "c: i-i- i-i- iii- iii- i-i- iiiii-", # L M
         "l'": "c: f-f- f-f- fff- fff- f-f- fffff-", # L' M'
         "l2": "c: l-l- l-l- lll- lll- l-l- lllll-", # L2 M2
+        "f" : "c: hh-- hh-- h-hh h-hh hh-- hhh-hh", # F S
+        "f'": "c: kk-- kk-- k-kk k-kk kk-- kkk-kk", # F' S'
+        "f2": "c: nn-- nn-- n-nn n-nn nn-- nnn-nn", # F2 S2
 
         "x" : "c: ffff ffff ffff ffff ffff ffffff", # Ff
         "x'": "c: iiii iiii iiii iiii iiii iiiiii", # Fi
@@ -266,80 +323,209 @@ class Cube :
 
         "quick---------jmj--------": "a: U2 PLL-UbM U2"
     }
-    static_cache = {}
-
-    def __init__ ( self, name = "", state = "-------- ------------ ------" ) :
-        self.name = name
-        self.state = {}
-        self.hist = []
-        if isinstance(state, str) :
-            state = state.replace(" ", "")
-            for i in range(len(state)) :
-                for k, v in Cube.operation_table.items() :
-                    if v["sym"] == state[i] :
-                        self.state[Cube.standard_order[i]] = k
-                        break
-                else :
-                    raise Exception(f"Invalid state: {state}")
-        elif isinstance(state, dict) :
-            self.state = state
-        else :
-            raise Exception(f"Invalid state: {state}")
-
-    def dump ( self ) :
-        print(f"{self.name} | {self.hist}")
-        for state in [self.repr_orient_str(), self.repr_distance()] :
-            print(f"  {state[:4]} {state[4:8]} {state[8:12]} {state[12:16]} {state[16:20]} {state[20:]}")
-
-    def distance ( self, other_cube ) :
-        print(f"Distance from {self.name} to {other_cube.name}")
-        self.dump()
-        other_cube.dump()
-        print(f"  {self.repr_distance()} -> {other_cube.repr_distance()}")
-        print(f"  {self.repr_orient_str()} -> {other_cube.repr_orient_str()}")
-        print(f"  {self.repr_inv_orient_str()} -> {other_cube.repr_inv_orient_str()}")
-        # Admissible heuristics are lower bounds on the distance to the goal
-
-        heuristics = []
+    # Admissible heuristics are lower bounds on the distance to the goal
+    heuristics = [
         # 9 piece heuristics; caps at 26*3/9 = 8.67
-        heuristics.append((["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR", "WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR", "W", "Y", "G", "B", "O", "R"], 9))
+        (["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR", "WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR", "W", "Y", "G", "B", "O", "R"], 9),
         # 8 piece heuristics;
         #  Non-centers; caps at 20*3/8 = 7.5
-        heuristics.append((["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR", "WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR"], 8))
+        (["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR", "WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR"], 8),
         # 4 piece heuristics
         #  Corners; caps at 8*3/4 = 6
-        heuristics.append((["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR"], 4))
+        (["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR"], 4),
         #  Edges heuristic; caps at 12*3/4 = 9
-        heuristics.append((["WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR"], 4))
+        (["WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR"], 4),
         # 3 piece heuristics
         # 2 piece heuristics
         #  Split edges; caps at 4*3/2 = 6
-        heuristics.append((["WGO", "WBR", "YGR", "YBO"], 2))
-        heuristics.append((["WGR", "WBO", "YGO", "YBR"], 2))
+        (["WGO", "WBR", "YGR", "YBO"], 2),
+        (["WGR", "WBO", "YGO", "YBR"], 2),
         #  Corner-grouped edges; caps at 6*3/2 = 9
-        heuristics.append((["WG", "WO", "YB", "YR", "GO", "BR"], 4))
-        heuristics.append((["WG", "WR", "YB", "YO", "GR", "BO"], 4))
-        heuristics.append((["WB", "WO", "YG", "YR", "BO", "GR"], 4))
-        heuristics.append((["WB", "WR", "YG", "YO", "BR", "GO"], 4))
+        (["WG", "WO", "YB", "YR", "GO", "BR"], 4),
+        (["WG", "WR", "YB", "YO", "GR", "BO"], 4),
+        (["WB", "WO", "YG", "YR", "BO", "GR"], 4),
+        (["WB", "WR", "YG", "YO", "BR", "GO"], 4),
         #  Slice edges; caps at 6*3/2 = 9
-        heuristics.append((["WB", "WR", "YG", "YO", "GR", "BO"], 2))
-        heuristics.append((["WB", "WO", "YG", "YR", "GO", "BR"], 2))
-        heuristics.append((["WG", "WR", "YB", "YO", "GO", "BR"], 2))
-        heuristics.append((["WG", "WO", "YB", "YR", "GR", "BO"], 2))
-
+        (["WB", "WR", "YG", "YO", "GR", "BO"], 2),
+        (["WB", "WO", "YG", "YR", "GO", "BR"], 2),
+        (["WG", "WR", "YB", "YO", "GO", "BR"], 2),
+        (["WG", "WO", "YB", "YR", "GR", "BO"], 2),
         # 1 piece heuristics
 
         # Grouped corners cap at 6, grouped edges cap at 9
+    ]
+    static_cache = AlgorithmCache()
+
+    # A state is 26 bytes of orientation indices; it is immutable, so copies and derived cubes share it
+    __slots__ = ("name", "orient", "hist")
+
+    def __init__ ( self, name = "", state = "-------- ------------ ------" ) :
+        if metrics.enabled :
+            metrics.count("cube.init")
+        self.name = name
+        self.hist = ()
+        if isinstance(state, bytes) :
+            self.orient = state
+        elif isinstance(state, (list, tuple, bytearray, memoryview)) :
+            self.orient = bytes(state)
+        elif isinstance(state, str) :
+            self.orient = Cube.decode(state)
+            if self.orient is None :
+                raise Exception(f"Invalid state: {state}")
+        elif isinstance(state, dict) :
+            self.state = state
+        else :
+            raise Exception(f"Invalid state: {state}")
+
+    @classmethod
+    def compile_tables ( cls ) :
+        """
+            Compiles the string tables into integer tables, so the hot paths never touch a string.
+            Pieces are indexed by their place in standard_order and orientations by their place in operation_table, so a state is a list of 26 orientation indices.
+            orient_mul[a][b] is the orientation reached by applying rotation b to orientation a, and position_index[piece][orientation] is the position the piece ends up in.
+        """
+        cls.orientations = list(cls.operation_table)
+        cls.symbols = "".join([v["sym"] for v in cls.operation_table.values()])
+        cls.orientation_index = {orientation: i for i, orientation in enumerate(cls.orientations)}
+        cls.symbol_index = {sym: i for i, sym in enumerate(cls.symbols)}
+        cls.piece_index = {piece: i for i, piece in enumerate(cls.standard_order)}
+        cls.orient_mul = [[cls.orientation_index[cls.rotate(None, a, b)] for b in cls.orientations] for a in cls.orientations]
+        cls.position_index = [[cls.piece_index[cls.find_pos(None, piece, orientation)] for orientation in cls.orientations] for piece in cls.standard_order]
+        cls.orientation_distance = [cls.orientation_distance_table["-"][sym] for sym in cls.symbols]
+        cls.orientation_inverse = [row.index(0) for row in cls.orient_mul]
+        cls.compile_conversions()
+        cls.compile_geometry()
+        cls.compile_symmetries()
+
+    @classmethod
+    def compile_conversions ( cls ) :
+        """
+            Compiles the tables that turn states into strings and back with bytes.translate, and the distance between any two orientations.
+            symbol_table maps a symbol byte onto its orientation index and every other byte onto 255, and orient_table and distance_table map an orientation index onto its symbol and onto its distance from "-".
+            orientation_distances[a][b] is the number of quarter turns of the whole cube between orientations a and b, the distance of the rotation that takes a to b; orientation_distance_table is filled in to the same 24x24 table, keyed by symbol. heuristic_indices holds the heuristics with their pieces as indices.
+        """
+        cls.symbol_table = bytes([cls.symbol_index.get(chr(byte), 255) for byte in range(256)])
+        cls.orient_table = cls.symbols.encode().ljust(256, b"?")
+        cls.distance_table = "".join([str(d) for d in cls.orientation_distance]).encode().ljust(256, b"?")
+        cls.orientation_distances = [[cls.orientation_distance[cls.orient_mul[cls.orientation_inverse[a]][b]] for b in range(len(cls.orientations))] for a in range(len(cls.orientations))]
+        cls.orientation_distance_table = {cls.symbols[a]: {cls.symbols[b]: d for b, d in enumerate(row)} for a, row in enumerate(cls.orientation_distances)}
+        cls.heuristic_indices = [([cls.piece_index[piece] for piece in pieces], group_size) for pieces, group_size in cls.heuristics]
+
+    @staticmethod
+    def decode ( string ) :
+        """
+            The orientation indices of an orientation string, spaces allowed, or None when it holds anything but symbols.
+        """
+        orient = string.replace(" ", "").encode().translate(Cube.symbol_table)
+        if len(orient) != len(Cube.standard_order) or 255 in orient :
+            return None
+        return orient
+
+    @classmethod
+    def compile_geometry ( cls ) :
+        """
+            Places the cube in space to find out where every sticker of every piece points.
+            Orientation "TF" is the rotation that turns the T face up and the F face to the front, so its matrix maps those face vectors onto the W and G ones.
+            twist_index[piece][orientation] is the twist of a corner or flip of an edge in the position it occupies: which face of the position holds the piece's W/Y sticker, counted clockwise from the W/Y face, or whether an edge's first sticker lies on the first face of its position.
+        """
+        vectors = {"W": (0, 0, 1), "Y": (0, 0, -1), "G": (0, -1, 0), "B": (0, 1, 0), "O": (-1, 0, 0), "R": (1, 0, 0)}
+        faces = {vector: face for face, vector in vectors.items()}
+        cross = lambda a, b : (a[1]*b[2] - a[2]*b[1], a[2]*b[0] - a[0]*b[2], a[0]*b[1] - a[1]*b[0])
+        dot = lambda a, b : sum([x*y for x, y in zip(a, b)])
+        cls.rotation_matrices = []
+        for top, front in cls.orientations :
+            source = [vectors[top], vectors[front], cross(vectors[top], vectors[front])]
+            target = [vectors["W"], vectors["G"], cross(vectors["W"], vectors["G"])]
+            cls.rotation_matrices.append(tuple([tuple([sum([target[k][row]*source[k][col] for k in range(3)]) for col in range(3)]) for row in range(3)]))
+        rotate = lambda matrix, vector : tuple([dot(row, vector) for row in matrix])
+        cls.sticker_faces = [[[faces[rotate(matrix, vectors[color])] for color in piece] for matrix in cls.rotation_matrices] for piece in cls.standard_order]
+        cls.twist_index = []
+        for piece, stickers in zip(cls.standard_order, cls.sticker_faces) :
+            twists = []
+            for o, faces_hit in enumerate(stickers) :
+                position = cls.standard_order[cls.position_index[cls.piece_index[piece]][o]]
+                if len(piece) == 3 :
+                    a, b, c = position
+                    if dot(cross(vectors[a], vectors[b]), vectors[c]) < 0 :
+                        b, c = c, b
+                    twists.append([a, b, c].index(faces_hit[0]))
+                elif len(piece) == 2 :
+                    twists.append(0 if faces_hit[0] == position[0] else 1)
+                else :
+                    twists.append(0)
+            cls.twist_index.append(twists)
+
+    @classmethod
+    def compile_symmetries ( cls ) :
+        """
+            Compiles the 48 symmetries of the cube: the 24 rotations, followed by the same rotations combined with a point reflection through the center.
+            Conjugating a state by symmetry S moves every piece p to the position S takes it to and turns its rotation R into S R S^-1, so a symmetry is one gather over the pieces and one translate over the orientations.
+            The point reflection swaps every piece with the opposite one but commutes with every rotation, so a reflected symmetry shares its orientation table with the plain rotation.
+        """
+        opposite = {"W": "Y", "Y": "W", "G": "B", "B": "G", "O": "R", "R": "O"}
+        names = {frozenset(piece): i for i, piece in enumerate(cls.standard_order)}
+        mirror = [names[frozenset([opposite[face] for face in piece])] for piece in cls.standard_order]
+        tables = [bytes([cls.orient_mul[cls.orient_mul[cls.orientation_inverse[s]][o]][s] for o in range(len(cls.orientations))]).ljust(256, b"\0") for s in range(len(cls.orientations))]
+        cls.symmetry_gathers = []
+        cls.symmetry_tables = []
+        for reflect in [False, True] :
+            for s, table in enumerate(tables) :
+                gather = [0]*len(cls.standard_order)
+                for piece, row in enumerate(cls.position_index) :
+                    gather[mirror[row[s]] if reflect else row[s]] = piece
+                cls.symmetry_gathers.append(operator.itemgetter(*gather))
+                cls.symmetry_tables.append(table)
+        cls.inverse_table = bytes(cls.orientation_inverse).ljust(256, b"\0")
+
+    @staticmethod
+    def compose ( a, b ) :
+        """
+            Composes two states given as orientation index lists; every piece of a is rotated by whatever b does at the position the piece occupies.
+        """
+        mul = Cube.orient_mul
+        return bytes([mul[o][b[row[o]]] for row, o in zip(Cube.position_index, a)])
+
+    @property
+    def state ( self ) :
+        return {piece: Cube.orientations[o] for piece, o in zip(Cube.standard_order, self.orient)}
+
+    @state.setter
+    def state ( self, state ) :
+        self.orient = bytes([Cube.orientation_index[state[piece]] for piece in Cube.standard_order])
+
+    def describe ( self ) :
+        lines = [f"{self.name} | {self.hist}"]
+        for state in [self.repr_orient_str(), self.repr_distance()] :
+            lines.append(f"  {state[:4]} {state[4:8]} {state[8:12]} {state[12:16]} {state[16:20]} {state[20:]}")
+        return lines
 
-        for heuristic in heuristics :
-            pieces, group_size = heuristic
-            result = sum([Cube.orientation_distance_table[Cube.operation_table[self.state[piece]]["sym"]][Cube.operation_table[other_cube.state[piece]]["sym"]] for piece in pieces]) / group_size
-            print(f"  {math.ceil(result)}/{math.ceil(len(pieces)*3/group_size)} | {pieces}")
+    def dump ( self ) :
+        print("\n".join(self.describe()))
+
+    def distance ( self, other_cube, max_depth = 14, max_memory = 1 << 28 ) :
+        """
+            Returns the exact number of face turns between the two cubes, found with search.distance, or -1 when the search gives up: either the distance is more than max_depth, or telling would take more than max_memory bytes, which by default reaches about 10 moves. search.distance reports the reason and the lower bound it proved.
+            How far apart the cubes look to the heuristics is logged at debug level on the "cube" logger.
+        """
+        if log.isEnabledFor(logging.DEBUG) :
+            log.debug(f"Distance from {self.name} to {other_cube.name}")
+            for line in self.describe() + other_cube.describe() :
+                log.debug(line)
+            log.debug(f"  {self.repr_distance()} -> {other_cube.repr_distance()}")
+            log.debug(f"  {self.repr_orient_str()} -> {other_cube.repr_orient_str()}")
+            log.debug(f"  {self.repr_inv_orient_str()} -> {other_cube.repr_inv_orient_str()}")
+            for (indices, group_size), (pieces, _) in zip(Cube.heuristic_indices, Cube.heuristics) :
+                result = sum([Cube.orientation_distances[self.orient[piece]][other_cube.orient[piece]] for piece in indices]) / group_size
+                log.debug(f"  {math.ceil(result)}/{math.ceil(len(pieces)*3/group_size)} | {pieces}")
         
         # Independent edge distance heuristics
         # ["WGO", "WGR", "WBO", "WBR", "YGO", "YGR", "YBO", "YBR", "WG", "WB", "WO", "WR", "YG", "YB", "YO", "YR", "GO", "GR", "BO", "BR", "W", "Y", "G", "B", "O", "R"]
 
-        return -1
+        from search import distance
+        with metrics.span("cube.distance") :
+            result = distance(self, other_cube, max_depth, max_memory)
+        log.debug(f"  {result}")
+        return result.distance if result.distance is not None else -1
 
     def find_pos ( self, piece, orientation ) :
         for step in Cube.operation_table[orientation]["dec"] :
@@ -352,74 +538,274 @@ class Cube :
         return orientation
 
     def repr_distance ( self ) :
-        return "".join([str(Cube.orientation_distance_table["-"][Cube.operation_table[orientation]["sym"]]) for orientation in self.state.values()])
+        return self.orient.translate(Cube.distance_table).decode()
 
     def repr_orient_str ( self ) :
-        return "".join([Cube.operation_table[self.state[piece]]["sym"] for piece in Cube.standard_order])
-    
+        return self.orient.translate(Cube.orient_table).decode()
+
     def repr_inv_orient_str ( self ) :
-        state = [None]*len(self.state)
-        for piece, orientation in self.state.items() :
-            pos = self.find_pos(piece, orientation)
-            if state[Cube.standard_order.index(pos)] is not None :
-                raise Exception(f"Invalid state: {self.state}; {pos} is already occupied by {state[Cube.standard_order.index(pos)]}")
-            state[Cube.standard_order.index(pos)] = Cube.operation_table[orientation]["sym"]
-        state = "".join(state)
-        
-        return state
+        state = bytearray(len(self.orient))
+        for piece, o in enumerate(self.orient) :
+            pos = Cube.position_index[piece][o]
+            if state[pos] :
+                raise Exception(f"Invalid state: {self.state}; {Cube.standard_order[pos]} is already occupied by {chr(state[pos])}")
+            state[pos] = Cube.orient_table[o]
+        return state.decode()
 
     def __mul__ ( self, other ) :
         if isinstance(other, Cube) :
-            new_state = {}
-            for piece, orientation in self.state.items() :
-                pos = self.find_pos(piece, orientation)
-                rotation = other.state[pos]
-                new_state[piece] = self.rotate(orientation, rotation)
-                
-            solution = Cube(self.name, new_state)
+            if metrics.enabled :
+                metrics.count("cube.multiply")
+            solution = Cube(self.name, Cube.compose(self.orient, other.orient))
             solution.hist = self.hist + other.hist
             return solution
         elif isinstance(other, str) :
-            if other.startswith("a: ") :
-                if other in Cube.static_cache :
-                    return self * Cube.static_cache[other]
-                other_list = other[3:].split(' ')
-                other_cube = Cube()
-                for step in other_list :
-                    if step == "" : continue
-                    if step in Cube.algorithms :
-                        other_cube *= Cube.algorithms[step]
-                    else :
-                        raise Exception(f"Invalid step: {step}")
-                other_cube.hist = other_list
-                Cube.static_cache[other] = other_cube
-                return self * other_cube
-
-            elif other.startswith("c: ") :
-                other = other[3:]
-                return self * Cube("", other)
-            else :
-                raise Exception(f"Invalid algorithm: {other}")
+            return self * Cube.compile(other)
+        elif isinstance(other, CubeExpression) :
+            return self * other.cube
         else :
             raise Exception(f"Invalid operation: {self} * {other}")
 
+    @staticmethod
+    def compile ( algorithm, compiling = () ) :
+        """
+            Compiles an algorithm string into a single Cube, whose hist holds the steps of the algorithm.
+            "a: " strings are split into steps once, and every step naming another entry of Cube.algorithms is compiled through the cache as well, so a nested macro is resolved to one permutation the first time it is used.
+            Compiled algorithms are kept in Cube.static_cache; clear it after changing Cube.algorithms.
+        """
+        cube = Cube.static_cache.get(algorithm)
+        if metrics.enabled :
+            metrics.count("cube.cache_miss" if cube is None else "cube.cache_hit")
+        if cube is not None :
+            return cube
+        if algorithm.startswith("a: ") :
+            steps = algorithm[3:].split()
+            orient = bytes(len(Cube.standard_order))
+            for i, step in enumerate(steps) :
+                if step not in Cube.algorithms :
+                    raise InvalidAlgorithm(f"Invalid step: {step} at step {i + 1} of {algorithm!r}")
+                if step in compiling :
+                    raise InvalidAlgorithm(f"Invalid step: {step} refers to itself in {algorithm!r}")
+                orient = Cube.compose(orient, Cube.compile(Cube.algorithms[step], compiling + (step,)).orient)
+            cube = Cube("", orient)
+            cube.hist = tuple(steps)
+        elif algorithm.startswith("c: ") :
+            try :
+                cube = Cube("", algorithm[3:])
+            except Exception :
+                raise InvalidAlgorithm(f"Invalid state: {algorithm!r}")
+        else :
+            raise InvalidAlgorithm(f"Invalid algorithm: {algorithm!r}; expected an \"a: \" or \"c: \" prefix")
+        Cube.static_cache.put(algorithm, cube)
+        return cube
+
+    @staticmethod
+    def warm_up ( ) :
+        """
+            Precompiles every entry of Cube.algorithms, so later multiplications only hit the cache.
+        """
+        for algorithm in Cube.algorithms.values() :
+            Cube.compile(algorithm)
+        return len(Cube.static_cache)
+
+    def copy ( self ) :
+        cube = Cube(self.name, self.orient)
+        cube.hist = self.hist
+        return cube
+
+    def lazy ( self ) :
+        """
+            A CubeExpression starting at this cube, which records what is multiplied onto it and only computes the state when it is looked at.
+        """
+        return CubeExpression(self)
+
+    def conjugate ( self, sym ) :
+        """
+            The state seen through symmetry sym, an index into the 48 compiled symmetries; 0 is the identity.
+        """
+        return Cube(self.name, bytes(Cube.symmetry_gathers[sym](self.orient)).translate(Cube.symmetry_tables[sym]))
+
+    def inverse ( self ) :
+        """
+            The state that undoes this one, so that cube * cube.inverse() is solved.
+        """
+        orient = bytearray(len(self.orient))
+        for piece, o in enumerate(self.orient) :
+            orient[Cube.position_index[piece][o]] = o
+        return Cube(self.name, bytes(orient).translate(Cube.inverse_table))
+
+    def canonical ( self, inverse = False ) :
+        """
+            Finds the representative of the state under the 48 symmetries, and under inversion as well when inverse is set.
+            Returns the representative as a 26 byte key, together with the symmetry and whether the state was inverted first, so that cube.inverse().conjugate(sym) or cube.conjugate(sym) reproduces the key.
+            Every state in the same class gets the same key, so the key can stand in for up to 96 states in tables and caches.
+        """
+        key, sym, inverted = self.orient, 0, False
+        candidates = [(self.orient, False), (self.inverse().orient, True)] if inverse else [(self.orient, False)]
+        for orient, flag in candidates :
+            for i, (gather, table) in enumerate(zip(Cube.symmetry_gathers, Cube.symmetry_tables)) :
+                candidate = bytes(gather(orient)).translate(table)
+                if candidate < key :
+                    key, sym, inverted = candidate, i, flag
+        return key, sym, inverted
+
+    def __eq__ ( self, other ) :
+        if isinstance(other, Cube) :
+            return self.orient == other.orient
+        return NotImplemented
+
+    def __hash__ ( self ) :
+        return hash(self.orient)
+
     def __str__ ( self ) :
         return f"{self.repr_orient_str()} | {self.repr_distance()} | {self.repr_inv_orient_str()}"
 
+Cube.compile_tables()
+
+class CubeExpression :
+    """
+        A CubeExpression is a cube with a list of steps still to be applied: names of Cube.algorithms entries, and Cubes.
+        Multiplying appends to a step list shared with the expression it came from, so a chain of n multiplications costs n appends instead of n states and n ever longer hist tuples; only an expression that branches off the middle of a list copies its part.
+        The steps are folded into one permutation, and the state computed, the first time the expression is observed: through orient or hist, printing, comparison, or any Cube method. Both are kept, and expressions derived afterwards start from the computed cube.
+    """
+
+    __slots__ = ("base", "steps", "start", "length", "folded", "materialized")
+
+    def __init__ ( self, base = None, steps = None, start = 0, length = 0 ) :
+        self.base = base if base is not None else Cube()
+        self.steps = steps if steps is not None else []
+        self.start = start
+        self.length = length
+        self.folded = None
+        self.materialized = None
+
+    def __len__ ( self ) :
+        return self.length - self.start
+
+    def extend ( self, steps ) :
+        if self.materialized is not None :
+            base, shared, start = self.materialized, [], 0
+        else :
+            base, shared, start = self.base, self.steps, self.start
+            if self.length != len(shared) :
+                shared, start = shared[start:self.length], 0
+        shared.extend(steps)
+        return CubeExpression(base, shared, start, len(shared))
+
+    def __mul__ ( self, other ) :
+        if isinstance(other, str) :
+            if not other.startswith("a: ") :
+                return self.extend([Cube.compile(other)])
+            steps = other[3:].split()
+            for i, step in enumerate(steps) :
+                if step not in Cube.algorithms :
+                    raise InvalidAlgorithm(f"Invalid step: {step} at step {i + 1} of {other!r}")
+            return self.extend(steps)
+        elif isinstance(other, Cube) :
+            return self.extend([other])
+        elif isinstance(other, CubeExpression) :
+            return self.extend([other.base] + other.steps[other.start:other.length])
+        else :
+            raise Exception(f"Invalid operation: {self} * {other}")
+
+    def permutation ( self ) :
+        """
+            The pending steps folded into the orientation indices of one state, which applies them all at once.
+        """
+        if self.folded is None :
+            folded = None
+            for step in self.steps[self.start:self.length] :
+                orient = Cube.compile(Cube.algorithms[step]).orient if isinstance(step, str) else step.orient
+                folded = orient if folded is None else Cube.compose(folded, orient)
+            self.folded = folded if folded is not None else bytes(len(Cube.standard_order))
+        return self.folded
+
+    @property
+    def cube ( self ) :
+        if self.materialized is None :
+            cube = Cube(self.base.name, Cube.compose(self.base.orient, self.permutation()) if len(self) else self.base.orient)
+            cube.hist = self.base.hist + tuple([item for step in self.steps[self.start:self.length] for item in ((step,) if isinstance(step, str) else step.hist)])
+            self.materialized = cube
+        return self.materialized
+
+    @property
+    def name ( self ) :
+        return self.base.name
+
+    @property
+    def orient ( self ) :
+        return self.cube.orient
+
+    @property
+    def hist ( self ) :
+        return self.cube.hist
+
+    def __getattr__ ( self, attribute ) :
+        # Only reached for attributes an expression does not have; unset slots must not recurse into cube
+        if attribute in CubeExpression.__slots__ or attribute.startswith("__") :
+            raise AttributeError(attribute)
+        return getattr(self.cube, attribute)
+
+    def __eq__ ( self, other ) :
+        if isinstance(other, (Cube, CubeExpression)) :
+            return self.orient == other.orient
+        return NotImplemented
+
+    def __hash__ ( self ) :
+        return hash(self.orient)
+
+    def __str__ ( self ) :
+        return str(self.cube)
+
 class Scrambler :
+    """
+        A Scrambler hands out scrambled cubes, either as a random walk of face turns with new, or as a uniformly random state with random_state.
+        A random state is drawn directly: random corner and edge permutations of equal parity, and random twists and flips whose sums are fixed by the last piece, which is exactly the set of states reachable by face turns.
+        Only the last history cubes of new are kept in scrambles; stream and write do not keep anything, so they run in constant memory.
+    """
     
-    def __init__ ( self, options = [["U", "U'", "U2", "D", "D'", "D2"], ["R", "R'", "R2", "L", "L'", "L2"], ["F", "F'", "F2", "B", "B'", "B2"]] ) :
+    def __init__ ( self, options = [["U", "U'", "U2", "D", "D'", "D2"], ["R", "R'", "R2", "L", "L'", "L2"], ["F", "F'", "F2", "B", "B'", "B2"]], seed = None, history = 1000 ) :
         self.options = options
-        self.scrambles = []
+        self.scrambles = collections.deque(maxlen = history)
+        self.random = random.Random(seed)
+
+    @classmethod
+    def compile_placements ( cls ) :
+        """
+            placements[piece][position][twist] is the orientation that puts the piece in the position with the given twist or flip.
+        """
+        cls.corners = range(8)
+        cls.edges = range(8, 20)
+        cls.placements = []
+        for piece, (positions, twists) in enumerate(zip(Cube.position_index[:20], Cube.twist_index[:20])) :
+            placement = {}
+            for o, (position, twist) in enumerate(zip(positions, twists)) :
+                placement.setdefault(position, {})[twist] = o
+            cls.placements.append({position: [twists[twist] for twist in sorted(twists)] for position, twists in placement.items()})
+
+    @staticmethod
+    def parity ( permutation ) :
+        seen = [False]*len(permutation)
+        parity = 0
+        for start in range(len(permutation)) :
+            if seen[start] :
+                continue
+            length = 0
+            while not seen[start] :
+                seen[start] = True
+                start = permutation[start]
+                length += 1
+            parity ^= (length - 1) & 1
+        return parity
 
     def new ( self ) :
         cube = Cube()
         scramble = []
         prev = -1
         for i in range(20) :
-            step = random.randint(0, len(self.options)-1)
+            step = self.random.randint(0, len(self.options)-1)
             step = (step + 1) % len(self.options) if step == prev else step
-            choice = random.choice(self.options[step])
+            choice = self.random.choice(self.options[step])
             scramble.append(choice)
             cube *= Cube.algorithms[choice]
             prev = step
@@ -427,23 +813,263 @@ class Scrambler :
         self.scrambles.append(cube)
         return cube
 
+    def random_orient ( self ) :
+        rng = self.random
+        corners = list(Scrambler.corners)
+        edges = list(Scrambler.edges)
+        rng.shuffle(corners)
+        rng.shuffle(edges)
+        if Scrambler.parity([position for position in corners]) != Scrambler.parity([position - 8 for position in edges]) :
+            edges[0], edges[1] = edges[1], edges[0]
+        twists = [rng.randrange(3) for i in range(7)]
+        twists.append(-sum(twists) % 3)
+        flips = [rng.randrange(2) for i in range(11)]
+        flips.append(sum(flips) % 2)
+        placements = Scrambler.placements
+        orient = [placements[piece][position][twist] for piece, position, twist in zip(Scrambler.corners, corners, twists)]
+        orient += [placements[piece][position][flip] for piece, position, flip in zip(Scrambler.edges, edges, flips)]
+        return bytes(orient) + bytes(len(Cube.standard_order) - 20)
+
+    def random_state ( self ) :
+        """
+            A uniformly random solvable state, named after its orientation string.
+        """
+        cube = Cube("", self.random_orient())
+        cube.name = "c: " + cube.repr_orient_str()
+        return cube
+
+    def stream ( self, count = None ) :
+        """
+            Yields count random states, or random states forever, without keeping them.
+        """
+        i = 0
+        while count is None or i < count :
+            yield self.random_state()
+            i += 1
+
+    def write ( self, path, count, chunk = 65536 ) :
+        """
+            Writes count random states to path as orientation strings, one per line, generating them chunk at a time with numpy; seeding the Scrambler makes the file reproducible.
+        """
+        from batch import CubeBatch
+        with open(path, "wb") as file :
+            for start in range(0, count, chunk) :
+                file.write(CubeBatch.random(min(chunk, count - start), self.random.getrandbits(64)).to_lines())
+
+Scrambler.compile_placements()
+
 class Solver :
+    """
+        A Solver looks for move sequences that bring its cube back to the solved state.
+        Solved means that every corner and edge is home; the centers only have one visible side, so their twist is ignored.
+    """
+
+    faces = ["U", "D", "R", "L", "F", "B"]
+    moves = [face + turn for face in faces for turn in ["", "'", "2"]]
+    patterns = None
+
+    class Exhausted ( Exception ) :
+        pass
+
     def __init__ ( self, cube ) :
         self.cube = cube
         self.solution = []
+        self.nodes = 0
 
-    def recenter ( self, debug = True ) :
-        print(f"Scrambler generated cubes dont need recentering; todo later")
+    @classmethod
+    def compile_moves ( cls ) :
+        """
+            Precompiles the face turns and the symmetries that map them onto each other.
+        """
+        cls.move_orients = [(Cube() * Cube.algorithms[move]).orient for move in cls.moves]
+        moves = {orient: move for move, orient in zip(cls.moves, cls.move_orients)}
+        cls.symmetry_moves = [{move: moves[Cube("", orient).conjugate(sym).orient] for move, orient in zip(cls.moves, cls.move_orients)} for sym in range(len(Cube.symmetry_gathers))]
+        cls.symmetry_inverse = [next(t for t in range(len(cls.symmetry_moves)) if all([cls.symmetry_moves[t][cls.symmetry_moves[s][move]] == move for move in cls.moves])) for s in range(len(cls.symmetry_moves))]
 
-    def solve_cross ( self, debug = True ) :
-        statestr = self.cube.repr_orient_str()
-        print(f"Solving cross for {self.cube.name}")
-        print(f"???? ???? ???? {statestr[12:16]} ???? ??????")
-        moves = ["R", "R'", "L", "L'", "F", "F'", "B", "B'", "U", "U'", "D", "D'"]
-        
-    def solve_2_look_oll ( self, debug = True ) :
-        print(f"Solving 2 look OLL for {self.cube.name}")
-        print(f"  Current state: {self.cube}")
+    @staticmethod
+    def conjugate_moves ( moves, sym ) :
+        """
+            Maps a sequence of face turns through symmetry sym; a solution of a state becomes a solution of cube.conjugate(sym).
+        """
+        return [Solver.symmetry_moves[sym][move] for move in moves]
+
+    @staticmethod
+    def invert_moves ( moves ) :
+        """
+            Reverses a sequence of face turns, undoing it; the inverted solution of cube.inverse() is a solution of the cube.
+        """
+        return [move if move.endswith("2") else move[:-1] if move.endswith("'") else move + "'" for move in reversed(moves)]
+
+    @classmethod
+    def pattern_heuristics ( cls ) :
+        """
+            The lookups of small pattern databases over four corners or four edges each, which together cover every corner and edge; they are built in memory on first use, in a few seconds.
+        """
+        if cls.patterns is None :
+            from pattern import PatternDatabase
+            groups = [PatternDatabase.corners[:4], PatternDatabase.corners[4:], PatternDatabase.edges[:4], PatternDatabase.edges[4:8], PatternDatabase.edges[8:]]
+            cls.patterns = [PatternDatabase.build(pieces) for pieces in groups]
+        return [database.lookup for database in cls.patterns]
+
+    def solve ( self, max_nodes = None, max_time = 10.0, max_depth = 20, heuristics = None ) :
+        """
+            Searches for an optimal face turn solution with iterative deepening A*, using the largest of the admissible heuristics as the estimate; by default these are the pattern_heuristics.
+            Sequences turning the same face twice, or turning opposite faces in non-canonical order, are pruned.
+            Returns the list of moves, or None when the node budget, the time budget of max_time seconds or the maximum depth runs out first; pass max_time = None to search without a time limit.
+        """
+        start = self.cube.orient
+        for center in range(20, 26) :
+            if Cube.position_index[center][start[center]] != center :
+                raise Exception(f"Invalid state: {self.cube.repr_orient_str()}; the centers are not in place")
+        heuristics = heuristics or Solver.pattern_heuristics()
+        deadline = None if max_time is None else time.perf_counter() + max_time
+        expansions = list(zip(range(len(Solver.moves)), [i // 3 for i in range(len(Solver.moves))], Solver.move_orients))
+        compose = Cube.compose
+        path = []
+        self.nodes = 0
+        self.pruned = 0
+
+        def estimate ( orient ) :
+            return max([heuristic(orient) for heuristic in heuristics])
+
+        def search ( orient, depth, bound, prev ) :
+            self.nodes += 1
+            if max_nodes is not None and self.nodes > max_nodes :
+                raise Solver.Exhausted()
+            if deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > deadline :
+                raise Solver.Exhausted()
+            cost = depth + estimate(orient)
+            if cost > bound :
+                self.pruned += 1
+                return cost
+            if not any(orient[:20]) :
+                return True
+            minimum = math.inf
+            for move, face, move_orient in expansions :
+                if face == prev or (face ^ 1 == prev and face < prev) :
+                    continue
+                path.append(move)
+                result = search(compose(orient, move_orient), depth + 1, bound, face)
+                if result is True :
+                    return True
+                path.pop()
+                minimum = min(minimum, result)
+            return minimum
+
+        self.solution = None
+        bound = estimate(start)
+        with metrics.span("solver.solve") :
+            try :
+                while bound <= max_depth :
+                    result = search(start, 0, bound, -1)
+                    if result is True :
+                        self.solution = [Solver.moves[move] for move in path]
+                        break
+                    bound = result
+            except Solver.Exhausted :
+                pass
+        if metrics.enabled :
+            metrics.count("solver.nodes", self.nodes)
+            metrics.count("solver.pruned", self.pruned)
+        return self.solution
+
+    def solve_two_phase ( self, max_time = 1.0, max_length = 30, target_length = 0, tables = None, stop = None ) :
+        """
+            Finds a near-optimal solution with Kociemba's two-phase algorithm, returning the shortest one found within max_time seconds, or the first one of at most target_length moves.
+            The move and pruning tables are built on first use and cached on disk; see twophase.Tables.
+        """
+        from twophase import Tables, TwoPhaseSolver
+        solver = TwoPhaseSolver(tables or Tables.load())
+        with metrics.span("solver.two_phase") :
+            self.solution = solver.solve(self.cube, max_time, max_length, target_length, stop)
+        self.nodes = solver.nodes
+        if metrics.enabled :
+            metrics.count("solver.nodes", self.nodes)
+        return self.solution
+
+    def stage ( self, name, solve, debug ) :
+        """
+            Runs one stage of a human method: solve returns the moves for the cube, which are applied to it and added to the solution.
+            Each stage is timed as the span solver.<name>, and its moves are logged on the "cube" logger, at info level when debug is set.
+        """
+        with metrics.span(f"solver.{name}") :
+            moves = solve(self.cube)
+        if moves :
+            self.cube = self.cube * ("a: " + " ".join(moves))
+        self.solution = list(self.solution or []) + moves
+        level = logging.INFO if debug else logging.DEBUG
+        if log.isEnabledFor(level) :
+            log.log(level, f"{name}: {' '.join(moves)}")
+            for line in self.cube.describe() :
+                log.log(level, line)
+        return moves
+
+    def recenter ( self, debug = False ) :
+        from cfop import CFOP
+        return self.stage("recenter", CFOP.recenter, debug)
+
+    def solve_cross ( self, debug = False ) :
+        from cfop import CFOP
+        return self.stage("cross", CFOP.solve_cross, debug)
+
+    def solve_f2l ( self, debug = False ) :
+        from cfop import CFOP
+        return self.stage("f2l", CFOP.solve_f2l, debug)
+
+    def solve_oll ( self, debug = False ) :
+        from cfop import LastLayer
+        return self.stage("oll", LastLayer.oll.lookup, debug)
+
+    def solve_2_look_oll ( self, debug = False ) :
+        from cfop import LastLayer
+        return self.stage("oll_2_look", LastLayer.oll_2_look.lookup, debug)
+
+    def solve_pll ( self, debug = False ) :
+        from cfop import LastLayer
+        return self.stage("pll", LastLayer.pll.lookup, debug)
+
+    def solve_cfop ( self, two_look = False, debug = False ) :
+        """
+            Solves the cube with CFOP: recenter, cross, first two layers, OLL and PLL, each looked up or walked down a table, so a solve takes milliseconds at the cost of a solution of around 60 moves.
+            The stages are run on a copy, and the joined moves are passed through the optimizer, which merges the turns across stage boundaries.
+        """
+        from optimize import Optimizer
+        cube = self.cube
+        self.solution = []
+        try :
+            with metrics.span("solver.cfop") :
+                self.recenter(debug)
+                self.solve_cross(debug)
+                self.solve_f2l(debug)
+                if two_look :
+                    self.solve_2_look_oll(debug)
+                else :
+                    self.solve_oll(debug)
+                self.solve_pll(debug)
+        finally :
+            self.cube = cube
+        self.solution = Optimizer().optimize(self.solution) if self.solution else []
+        return self.solution
+
+    def solve_cached ( self, cache, method = "solve_two_phase", **options ) :
+        """
+            Answers from a cache.SolutionCache when it knows the state, and otherwise solves with the named method, passing the options on, and stores the solution.
+            Only face turn solutions of cubes with their centers in place are cached; anything else is solved every time.
+        """
+        self.solution = cache.get(self.cube)
+        if self.solution is not None :
+            if metrics.enabled :
+                metrics.count("solver.solution_cache_hit")
+            return self.solution
+        if metrics.enabled :
+            metrics.count("solver.solution_cache_miss")
+        solution = getattr(self, method)(**options)
+        if solution is not None and all([move in Solver.symmetry_moves[0] for move in solution]) :
+            cache.put(self.cube, solution)
+        self.solution = solution
+        return solution
+
+Solver.compile_moves()
 
 if __name__ == "__main__" :
     """
@@ -0,0 +1,167 @@
+import concurrent.futures
+import multiprocessing
+import sys
+
+from cube import Cube, Solver
+from cfop import LastLayer
+
+class Target :
+    """
+        A Target is a set of effects to look for among move sequences, compared through a key of the state a sequence leaves on a solved cube.
+        Kind "state" keys a state by its corners and edges, so a match has exactly the effect of one of the cubes, up to the twist of the centers. Kind "oll" keys a state that leaves the first two layers alone by the OLL case it solves, that is the twists and flips of its inverse, and every other state by None, so a match solves the same OLL case whatever it does to the permutation of the last layer.
+        With aufs set, every cube is also taken after and before each U turn, so matches may differ from the cubes by an AUF on either side.
+    """
+
+    kinds = ["state", "oll"]
+    f2l = bytes(4)
+
+    def __init__ ( self, kind, cubes, aufs = True ) :
+        if kind not in Target.kinds :
+            raise Exception(f"Invalid target kind: {kind}; expected one of {Target.kinds}")
+        self.kind = kind
+        turns = [Cube.compile("a: " + " ".join(auf)) for auf in LastLayer.aufs] if aufs else [Cube()]
+        self.keys = set()
+        for cube in cubes :
+            cube = Cube.compile(cube) if isinstance(cube, str) else cube
+            for before in turns :
+                for after in turns :
+                    key = self.key((before * cube * after).orient)
+                    if key is not None :
+                        self.keys.add(key)
+
+    @classmethod
+    def algorithm ( cls, name, kind = "state", aufs = True ) :
+        """
+            The target of an entry of Cube.algorithms or an "a: " algorithm string.
+        """
+        return cls(kind, [Cube.algorithms.get(name, name)], aufs)
+
+    def key ( self, orient ) :
+        if self.kind == "state" :
+            return orient[:20]
+        if orient[4:8] != Target.f2l or orient[12:20] != Target.f2l * 2 :
+            return None
+        return LastLayer.oll_key(Cube("", orient).inverse())
+
+    def __contains__ ( self, orient ) :
+        return self.key(orient) in self.keys
+
+class Discovery :
+    """
+        Discovery enumerates the canonical sequences of a set of face turns depth first: a face is never turned twice in a row, and of two opposite faces turned in a row the one later in Solver.faces never comes first, as the two commute.
+        The state is carried along the stack, so every sequence costs one composition with the state of its parent. With unique set, a dict from the corners and edges, packed into one integer, to the shallowest depth they were reached at prunes every sequence that reaches a state already seen as early or earlier; a state can then still be reached again by a shorter sequence later on. Every entry takes about 100 bytes, so only the first max_seen states are remembered.
+        search filters the walk against a Target and yields each match as soon as it is found; search_parallel splits the tree by the prefixes of a given length over worker processes and streams their matches back through a queue. A walk given a stop event looks at it every few thousand sequences and ends once it is set.
+    """
+
+    def __init__ ( self, moves = None ) :
+        self.moves = list(moves or Solver.moves)
+        for move in self.moves :
+            if move not in Solver.moves :
+                raise Exception(f"Invalid move: {move}; only face turns can be enumerated")
+        faces = [Solver.faces.index(move[0]) for move in self.moves]
+        orients = [Cube.compile(Cube.algorithms[move]).orient for move in self.moves]
+        allowed = lambda face, prev : face != prev and not (face ^ 1 == prev and face < prev)
+        self.successors = [[(move, orient, face) for move, orient, face in zip(self.moves, orients, faces) if allowed(face, prev)] for prev in range(-1, len(Solver.faces))]
+
+    def walk ( self, max_depth, prefix = (), unique = False, max_seen = 1 << 21, stop = None ) :
+        """
+            Yields (moves, orient) for the prefix and every canonical sequence extending it by up to max_depth moves in total, with the state each leaves on a solved cube.
+        """
+        path = list(prefix)
+        orient = Cube.compile("a: " + " ".join(path)).orient if path else bytes(len(Cube.standard_order))
+        prev = Solver.faces.index(path[-1][0]) if path else -1
+        seen = {int.from_bytes(orient[:20], "little"): len(path)} if unique else None
+        if len(path) <= max_depth :
+            yield tuple(path), orient
+        if len(path) >= max_depth :
+            return
+        compose = Cube.compose
+        stack = [(orient, iter(self.successors[prev + 1]))]
+        steps = 0
+        while stack :
+            steps += 1
+            if stop is not None and steps & 4095 == 0 and stop.is_set() :
+                return
+            state, successors = stack[-1]
+            step = next(successors, None)
+            if step is None :
+                stack.pop()
+                if len(path) > len(prefix) :
+                    path.pop()
+                continue
+            move, move_orient, face = step
+            following = compose(state, move_orient)
+            depth = len(stack) + len(prefix)
+            if unique :
+                key = int.from_bytes(following[:20], "little")
+                if seen.get(key, max_depth + 1) <= depth :
+                    continue
+                if len(seen) < max_seen or key in seen :
+                    seen[key] = depth
+            path.append(move)
+            yield tuple(path), following
+            if depth < max_depth :
+                stack.append((following, iter(self.successors[face + 1])))
+            else :
+                path.pop()
+
+    def prefixes ( self, depth ) :
+        return [moves for moves, orient in self.walk(depth) if len(moves) == depth]
+
+    def search ( self, target, max_depth, prefix = (), unique = False, min_depth = 1, stop = None ) :
+        """
+            Yields every canonical sequence of min_depth to max_depth moves, starting with prefix, whose state is in the target, as a list of moves.
+        """
+        for moves, orient in self.walk(max_depth, prefix, unique, stop = stop) :
+            if len(moves) >= min_depth and orient in target :
+                yield list(moves)
+
+    def search_parallel ( self, target, max_depth, processes = None, split_depth = 2, unique = False, min_depth = 1 ) :
+        """
+            The matches of search, found by worker processes that each walk the subtrees of some of the prefixes of split_depth moves; shorter sequences are searched here first. Matches arrive in the order they are found, and every worker keeps its own seen-set.
+            Closing the generator early sets a stop event shared with the workers, drops the chunks that have not started and waits for the running ones to notice the event.
+        """
+        split_depth = min(split_depth, max_depth)
+        yield from self.search(target, split_depth - 1, unique = unique, min_depth = min_depth)
+        prefixes = self.prefixes(split_depth)
+        processes = processes or multiprocessing.cpu_count()
+        with multiprocessing.Manager() as manager :
+            queue = manager.Queue()
+            stop = manager.Event()
+            pool = concurrent.futures.ProcessPoolExecutor(processes)
+            try :
+                chunks = [prefixes[i::processes * 4] for i in range(min(len(prefixes), processes * 4))]
+                futures = [pool.submit(search_prefixes, self.moves, target, max_depth, chunk, unique, min_depth, queue, stop) for chunk in chunks]
+                finished = 0
+                while finished < len(futures) :
+                    moves = queue.get()
+                    if moves is None :
+                        finished += 1
+                    else :
+                        yield moves
+                for future in futures :
+                    future.result()
+            finally :
+                stop.set()
+                pool.shutdown(cancel_futures = True)
+
+def search_prefixes ( moves, target, max_depth, prefixes, unique, min_depth, queue, stop = None ) :
+    try :
+        discovery = Discovery(moves)
+        for prefix in prefixes :
+            if stop is not None and stop.is_set() :
+                break
+            for match in discovery.search(target, max_depth, prefix, unique, min_depth, stop) :
+                queue.put(match)
+    finally :
+        queue.put(None)
+
+if __name__ == "__main__" :
+    if len(sys.argv) in [3, 4, 5] and sys.argv[1] in Cube.algorithms :
+        kind = "oll" if sys.argv[1].startswith("OLL-") else "state"
+        moves = sys.argv[3].split(",") if len(sys.argv) > 3 else None
+        for match in Discovery(moves).search_parallel(Target.algorithm(sys.argv[1], kind), int(sys.argv[2]), unique = len(sys.argv) > 4 and sys.argv[4] == "unique") :
+            print(" ".join(match), flush = True)
+    else :
+        print(f"Usage: {sys.argv[0]} algorithm_name max_depth [move,move,...] [unique]")
+        sys.exit(1)
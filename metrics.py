@@ -0,0 +1,156 @@
+"""
+    Opt-in counters and timing spans for the hot paths of Cube and Solver.
+    Instrumented code checks metrics.enabled before it calls in, so while nothing listens the cost is one attribute lookup. Metrics are on while enable() is in effect or any profile is open; an open profile only collects the events of its own thread.
+    Every event that is recorded, globally or by a profile of the thread that raised it, is also handed to the registered exporters as exporter(kind, name, value), with kind "count" or "span" and the value in events or seconds; while only profiles are open, the events of other threads are dropped.
+    The global counters are shared by every thread and updated under the lock; profiles are only ever touched by their own thread.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+enabled = False
+recording = False
+counters = collections.Counter()
+spans = collections.defaultdict(lambda : [0, 0.0])
+exporters = []
+
+lock = threading.Lock()
+local = threading.local()
+open_profiles = 0
+
+def enable ( ) :
+    global recording
+    with lock :
+        recording = True
+        refresh()
+
+def disable ( ) :
+    global recording
+    with lock :
+        recording = False
+        refresh()
+
+def refresh ( ) :
+    global enabled
+    enabled = recording or open_profiles > 0
+
+def reset ( ) :
+    with lock :
+        counters.clear()
+        spans.clear()
+
+def add_exporter ( exporter ) :
+    exporters.append(exporter)
+    return exporter
+
+def remove_exporter ( exporter ) :
+    exporters.remove(exporter)
+
+def active ( ) :
+    return getattr(local, "profiles", ())
+
+def count ( name, value = 1 ) :
+    profiles = active()
+    if recording :
+        with lock :
+            counters[name] += value
+    elif not profiles :
+        return
+    for profile in profiles :
+        profile.counters[name] += value
+    for exporter in exporters :
+        exporter("count", name, value)
+
+def record ( name, seconds ) :
+    profiles = active()
+    if recording :
+        with lock :
+            entry = spans[name]
+            entry[0] += 1
+            entry[1] += seconds
+    elif not profiles :
+        return
+    for profile in profiles :
+        entry = profile.spans[name]
+        entry[0] += 1
+        entry[1] += seconds
+    for exporter in exporters :
+        exporter("span", name, seconds)
+
+class Span :
+    """
+        Times the block it wraps and records it under its name when the block exits, also when it raises.
+    """
+
+    def __init__ ( self, name ) :
+        self.name = name
+
+    def __enter__ ( self ) :
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__ ( self, *args ) :
+        record(self.name, time.perf_counter() - self.start)
+
+class NoSpan :
+
+    def __enter__ ( self ) :
+        return self
+
+    def __exit__ ( self, *args ) :
+        pass
+
+no_span = NoSpan()
+
+def span ( name ) :
+    return Span(name) if enabled else no_span
+
+def snapshot ( ) :
+    with lock :
+        return {"counters": dict(counters), "spans": {name: {"count": n, "seconds": seconds} for name, (n, seconds) in spans.items()}}
+
+class Profile :
+    """
+        Collects the counters and spans of one request: every event raised by this thread between entering and leaving the block, whether or not metrics are enabled globally.
+        Profiles nest, and an event counts towards every profile that is open.
+    """
+
+    def __init__ ( self ) :
+        self.counters = collections.Counter()
+        self.spans = collections.defaultdict(lambda : [0, 0.0])
+        self.elapsed = 0.0
+
+    def __enter__ ( self ) :
+        global open_profiles
+        local.profiles = active() + (self,)
+        with lock :
+            open_profiles += 1
+            refresh()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__ ( self, *args ) :
+        global open_profiles
+        self.elapsed = time.perf_counter() - self.start
+        local.profiles = tuple([profile for profile in active() if profile is not self])
+        with lock :
+            open_profiles -= 1
+            refresh()
+
+    def report ( self ) :
+        return {"elapsed": self.elapsed, "counters": dict(self.counters), "spans": {name: {"count": n, "seconds": seconds} for name, (n, seconds) in self.spans.items()}}
+
+def profile ( ) :
+    return Profile()
+
+def logging_exporter ( logger = None, level = logging.DEBUG ) :
+    """
+        An exporter that writes every event to a logger as a structured record, with the event in the extra fields metric_kind, metric_name and metric_value.
+    """
+    logger = logger or logging.getLogger("metrics")
+    def export ( kind, name, value ) :
+        if logger.isEnabledFor(level) :
+            logger.log(level, "%s %s %s", kind, name, value, extra = {"metric_kind": kind, "metric_name": name, "metric_value": value})
+    return export
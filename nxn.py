@@ -0,0 +1,229 @@
+import re
+
+import numpy as np
+
+from cube import AlgorithmCache, Cube
+
+class NxN :
+    """
+        The geometry and move tables of an N x N x N cube, built once per size; NxN.of(n) hands out the shared instance.
+        A state is a flat uint8 array of 6 N^2 facelets, each holding the index of its color in NxN.colors. The faces follow NxN.faces, and every face is read row by row as it is seen in the usual net: U with B at the top, F, R, B and L with U at the top, D with F at the top.
+        Every facelet sits at an integer point 2 (N - 1) wide along each axis, so a layer turn is a rotation of the points in a plane. Turning a layer is compiled once into the pair of index arrays (targets, sources) of the facelets it moves, 4 N of them for an inner layer plus N^2 for an outer one, and is applied as state[targets] = state[sources], so its cost grows with the layer and not with the cube.
+        Moves are outer turns like R, R' and R2, single inner layers like 2R, wide turns like Rw or 3Rw, and the rotations x, y and z, which turn like R, U and F.
+    """
+
+    faces = ["U", "D", "F", "B", "L", "R"]
+    colors = "WYGBOR"
+    normals = {"U": (0, 0, 1), "D": (0, 0, -1), "F": (0, -1, 0), "B": (0, 1, 0), "L": (-1, 0, 0), "R": (1, 0, 0)}
+    # The right and down directions of every face as it is seen from outside, in the net
+    frames = {"U": ((1, 0, 0), (0, -1, 0)), "D": ((1, 0, 0), (0, 1, 0)), "F": ((1, 0, 0), (0, 0, -1)), "B": ((-1, 0, 0), (0, 0, -1)), "L": ((0, -1, 0), (0, 0, -1)), "R": ((0, 1, 0), (0, 0, -1))}
+    rotations = {"x": "R", "y": "U", "z": "F"}
+    notation = re.compile(r"^(\d*)([UDFBLR])(w?)(['2]?)$|^([xyz])(['2]?)$")
+    amounts = {"": 1, "2": 2, "'": 3}
+    sizes = {}
+
+    def __init__ ( self, n ) :
+        if n < 1 :
+            raise Exception(f"Invalid size: {n}")
+        self.n = n
+        self.points = []
+        for face in NxN.faces :
+            normal, (right, down) = NxN.normals[face], NxN.frames[face]
+            for row in range(n) :
+                for col in range(n) :
+                    position = tuple([(n - 1)*a + (2*col - n + 1)*b + (2*row - n + 1)*c for a, b, c in zip(normal, right, down)])
+                    self.points.append((position, normal))
+        self.index = {point: i for i, point in enumerate(self.points)}
+        self.positions = np.array([position for position, normal in self.points], dtype=np.int64)
+        self.solved = np.repeat(np.arange(6, dtype=np.uint8), n * n)
+        self.layers = {}
+        self.cache = AlgorithmCache(1024)
+
+    @classmethod
+    def of ( cls, n ) :
+        if n not in cls.sizes :
+            cls.sizes[n] = cls(n)
+        return cls.sizes[n]
+
+    @staticmethod
+    def turn ( vector, axis ) :
+        """
+            Turns a vector a quarter clockwise, as seen looking at the axis from outside: (axis . v) axis - axis x v.
+        """
+        x, y, z = vector
+        a, b, c = axis
+        d = a*x + b*y + c*z
+        return (d*a - (b*z - c*y), d*b - (c*x - a*z), d*c - (a*y - b*x))
+
+    def layer ( self, face, depth ) :
+        """
+            The (targets, sources) index arrays of a clockwise quarter turn of the layer depth steps in from face, 0 being the face itself.
+        """
+        key = (face, depth)
+        if key not in self.layers :
+            if not 0 <= depth < self.n :
+                raise Exception(f"Invalid layer: {depth + 1}{face} on a {self.n}x{self.n}x{self.n} cube")
+            axis = NxN.normals[face]
+            level = self.n - 1 - 2*depth
+            sources = np.flatnonzero(self.positions @ np.array(axis) == level)
+            targets = np.array([self.index[(NxN.turn(self.points[i][0], axis), NxN.turn(self.points[i][1], axis))] for i in sources], dtype=np.intp)
+            self.layers[key] = (targets, sources)
+        return self.layers[key]
+
+    def parse ( self, move ) :
+        """
+            Resolves a move into its layers as (face, depth) pairs and the number of clockwise quarter turns.
+        """
+        match = NxN.notation.match(move)
+        if match is None :
+            raise Exception(f"Invalid move: {move}")
+        prefix, face, wide, suffix, rotation, rotation_suffix = match.groups()
+        if rotation :
+            return [(NxN.rotations[rotation], depth) for depth in range(self.n)], NxN.amounts[rotation_suffix]
+        count = int(prefix) if prefix else (2 if wide else 1)
+        if count < 1 or count > self.n :
+            raise Exception(f"Invalid move: {move} on a {self.n}x{self.n}x{self.n} cube")
+        depths = range(count) if wide else [count - 1]
+        return [(face, depth) for depth in depths], NxN.amounts[suffix]
+
+    def steps ( self, moves ) :
+        """
+            The (targets, sources) pairs that carry out a sequence of moves, one per quarter turn of a layer.
+        """
+        if isinstance(moves, str) :
+            moves = moves[3:].split() if moves.startswith("a: ") else moves.split()
+        steps = []
+        for move in moves :
+            layers, amount = self.parse(move)
+            for i in range(amount) :
+                steps.extend([self.layer(face, depth) for face, depth in layers])
+        return steps
+
+    def compile ( self, moves ) :
+        """
+            Composes a sequence of moves into one permutation of all facelets, so that state[permutation] applies the whole sequence at once; compiled sequences are kept per size in a bounded least recently used cache, like compiled algorithms.
+        """
+        key = moves if isinstance(moves, str) else " ".join(moves)
+        permutation = self.cache.get(key)
+        if permutation is None :
+            permutation = np.arange(6 * self.n * self.n, dtype=np.intp)
+            for targets, sources in self.steps(moves) :
+                permutation[targets] = permutation[sources]
+            self.cache.put(key, permutation)
+        return permutation
+
+    def apply ( self, states, moves ) :
+        """
+            Applies a sequence of moves to a single state or to an (M, 6 N^2) batch of states, returning new arrays.
+            A short sequence moves only the facelets of its layers, one turn at a time; a long one is compiled into a single gather over the whole state.
+        """
+        states = np.array(states, dtype=np.uint8)
+        steps = self.steps(moves)
+        if sum([len(targets) for targets, sources in steps]) > len(self.points) :
+            return states[..., self.compile(moves)]
+        for targets, sources in steps :
+            states[..., targets] = states[..., sources]
+        return states
+
+    def is_solved ( self, states ) :
+        """
+            Whether every face of a state shows a single color, for one state or per state of a batch; cubes with an even size have no fixed centers, so the colors may sit on any faces.
+        """
+        faces = np.asarray(states).reshape(np.shape(states)[:-1] + (6, self.n * self.n))
+        return (faces == faces[..., :1]).all(axis=(-2, -1))
+
+    def from_string ( self, string ) :
+        string = string.replace(" ", "")
+        if len(string) != len(self.points) or any([color not in NxN.colors for color in string]) :
+            raise Exception(f"Invalid state: {string}")
+        return np.array([NxN.colors.index(color) for color in string], dtype=np.uint8)
+
+    def to_string ( self, state ) :
+        face = self.n * self.n
+        return " ".join(["".join([NxN.colors[color] for color in state[i:i + face]]) for i in range(0, len(self.points), face)])
+
+    def from_cube ( self, cube ) :
+        """
+            The facelets of a 3x3x3 Cube; only defined for N = 3.
+        """
+        self.require(3)
+        state = np.zeros(len(self.points), dtype=np.uint8)
+        for piece, o in enumerate(cube.orient) :
+            position = self.cubie(Cube.standard_order[Cube.position_index[piece][o]])
+            for color, face in zip(Cube.standard_order[piece], Cube.sticker_faces[piece][o]) :
+                state[self.index[(position, NxN.normals[NxN.faces[NxN.colors.index(face)]])]] = NxN.colors.index(color)
+        return state
+
+    def to_cube ( self, state ) :
+        """
+            The 3x3x3 Cube showing these facelets, or an exception when no such cube exists; only defined for N = 3.
+            Facelets cannot show how a center is turned, so every center gets the first orientation that leaves it in place.
+        """
+        self.require(3)
+        orient = bytearray(len(Cube.standard_order))
+        found = set()
+        for position, name in enumerate(Cube.standard_order) :
+            cubie = self.cubie(name)
+            faces = [NxN.colors[NxN.faces.index(face)] for face in NxN.faces if self.index.get((cubie, NxN.normals[face])) is not None]
+            shown = {face: NxN.colors[state[self.index[(cubie, NxN.normals[NxN.faces[NxN.colors.index(face)]])]]] for face in faces}
+            piece = Cube.piece_index.get(next((candidate for candidate in Cube.standard_order if sorted(candidate) == sorted(shown.values())), None))
+            o = None if piece is None else next((o for o in range(len(Cube.orientations)) if Cube.position_index[piece][o] == position and all([shown[face] == color for color, face in zip(Cube.standard_order[piece], Cube.sticker_faces[piece][o])])), None)
+            if o is None or piece in found :
+                raise Exception(f"Invalid state: {self.to_string(state)}; no piece shows {''.join(shown.values())} at {name}")
+            found.add(piece)
+            orient[piece] = o
+        return Cube("", bytes(orient))
+
+    def cubie ( self, name ) :
+        """
+            The point at the middle of the cubie of a 3x3x3 position, named by the colors of the faces it touches.
+        """
+        return tuple([2 * sum(vector) for vector in zip(*[NxN.normals[NxN.faces[NxN.colors.index(color)]] for color in name])])
+
+    def require ( self, n ) :
+        if self.n != n :
+            raise Exception(f"Invalid size: {self.n}; only a {n}x{n}x{n} cube converts to Cube")
+
+class NxNCube :
+    """
+        A state of an N x N x N cube, as a facelet array of its NxN tables; multiplying by a move sequence, in the "a: " form or as a plain string or list, returns a new NxNCube.
+    """
+
+    def __init__ ( self, n = 3, state = None ) :
+        self.puzzle = NxN.of(n)
+        if state is None :
+            self.state = self.puzzle.solved.copy()
+        elif isinstance(state, str) :
+            self.state = self.puzzle.from_string(state)
+        else :
+            self.state = np.array(state, dtype=np.uint8)
+            if self.state.shape != self.puzzle.solved.shape :
+                raise Exception(f"Invalid state shape: {self.state.shape}")
+
+    @property
+    def n ( self ) :
+        return self.puzzle.n
+
+    def __mul__ ( self, moves ) :
+        return NxNCube(self.n, self.puzzle.apply(self.state, moves))
+
+    def __eq__ ( self, other ) :
+        if isinstance(other, NxNCube) :
+            return self.n == other.n and (self.state == other.state).all()
+        return NotImplemented
+
+    def __hash__ ( self ) :
+        return hash((self.n, self.state.tobytes()))
+
+    def __str__ ( self ) :
+        return self.puzzle.to_string(self.state)
+
+    def is_solved ( self ) :
+        return bool(self.puzzle.is_solved(self.state))
+
+    @classmethod
+    def from_cube ( cls, cube ) :
+        return cls(3, NxN.of(3).from_cube(cube))
+
+    def to_cube ( self ) :
+        return self.puzzle.to_cube(self.state)
@@ -0,0 +1,144 @@
+import collections
+
+from cube import Cube, InvalidAlgorithm, Solver
+
+class Optimizer :
+    """
+        An Optimizer rewrites an algorithm into an equivalent, shorter sequence of face turns.
+        Every basic entry of Cube.algorithms is some face turns followed by a whole-cube rotation, e.g. M is R L' followed by x'. Macros are flattened into these entries, and every rotation is pushed to the end of the sequence by relabeling the turns behind it through the symmetry tables, leaving a plain list of face turns and one net rotation.
+        Turns of the same face are then merged and cancelled, looking past a turn of the opposite face since the two commute, and commuting pairs are put in a fixed order. In the slice turn metric, a pair of opposite turns that forms a slice turn is contracted back into it; in the half turn metric slices stay expanded, as they cost two turns either way. Wide turns are one face turn and a rotation, so they are never cheaper than their expansion.
+        The result is checked against the original, ignoring the twist of the centers, which face turns change but which cannot be seen.
+    """
+
+    metrics = ["htm", "stm"]
+    amounts = {"": 1, "2": 2, "'": 3}
+    suffixes = {1: "", 2: "2", 3: "'"}
+
+    def __init__ ( self, metric = "htm" ) :
+        if metric not in Optimizer.metrics :
+            raise Exception(f"Invalid metric: {metric}; expected one of {Optimizer.metrics}")
+        self.metric = metric
+
+    @classmethod
+    def compile_tables ( cls ) :
+        """
+            Finds, for every basic entry of Cube.algorithms, at most two face turns of opposite faces and a rotation that reproduce it.
+            rotation_names[r] is the shortest sequence of x, y and z turns reaching rotation r, and slices maps pairs of opposite face turns onto a slice turn and the rotation left over.
+        """
+        rotations = {o: Cube("", bytes([o]) * len(Cube.standard_order)) for o in range(len(Cube.orientations))}
+        turns = {move: Cube.compile(Cube.algorithms[move]) for move in Solver.moves}
+        pairs = [[]] + [[move] for move in Solver.moves] + [[a, b] for a in Solver.moves for b in Solver.moves if Solver.faces.index(a[0]) % 2 == 0 and Solver.faces.index(b[0]) == Solver.faces.index(a[0]) ^ 1]
+        products = []
+        for pair in pairs :
+            cube = Cube()
+            for move in pair :
+                cube = cube * turns[move]
+            products.extend([(tuple(pair), o, cube * rotation) for o, rotation in rotations.items()])
+        cls.decompositions = {}
+        for name, algorithm in Cube.algorithms.items() :
+            if not algorithm.startswith("c: ") :
+                continue
+            target = Cube.compile(algorithm)
+            for pair, o, cube in products :
+                if Optimizer.equivalent(cube, target) :
+                    cls.decompositions[name] = (pair, o)
+                    break
+        cls.rotation_names = {0: []}
+        queue = collections.deque([0])
+        while queue :
+            o = queue.popleft()
+            for name in ["x", "x'", "y", "y'", "y2", "z", "z'"] :
+                step = cls.decompositions[name][1]
+                if Cube.orient_mul[o][step] not in cls.rotation_names :
+                    cls.rotation_names[Cube.orient_mul[o][step]] = cls.rotation_names[o] + [name]
+                    queue.append(Cube.orient_mul[o][step])
+        cls.slices = {pair: (name, Cube.orientation_inverse[o]) for name, (pair, o) in cls.decompositions.items() if len(pair) == 2}
+
+    @staticmethod
+    def equivalent ( a, b ) :
+        """
+            Whether two cubes look the same: the same corners and edges, and the centers in the same places.
+        """
+        return a.orient[:20] == b.orient[:20] and all([Cube.position_index[piece][x] == Cube.position_index[piece][y] for piece, x, y in zip(range(20, len(Cube.standard_order)), a.orient[20:], b.orient[20:])])
+
+    @staticmethod
+    def flatten ( algorithm, expanding = () ) :
+        """
+            Resolves an algorithm string, algorithm name or list of steps into the basic entries of Cube.algorithms it is made of.
+        """
+        if isinstance(algorithm, str) :
+            if algorithm.startswith("a: ") :
+                algorithm = algorithm[3:].split()
+            elif algorithm.startswith("c: ") :
+                raise InvalidAlgorithm(f"Invalid algorithm: {algorithm!r}; a state has no moves to optimize")
+            else :
+                algorithm = algorithm.split()
+        moves = []
+        for step in algorithm :
+            if step not in Cube.algorithms or step in expanding :
+                raise InvalidAlgorithm(f"Invalid step: {step} in {' '.join(algorithm)!r}")
+            if Cube.algorithms[step].startswith("a: ") :
+                moves.extend(Optimizer.flatten(Cube.algorithms[step], expanding + (step,)))
+            else :
+                moves.append(step)
+        return moves
+
+    @staticmethod
+    def push ( turns, move ) :
+        """
+            Appends a face turn, merging it with the last turn of the same face when only a turn of the opposite face lies between them.
+        """
+        face = Solver.faces.index(move[0])
+        amount = Optimizer.amounts[move[1:]]
+        for back in [1, 2] :
+            if len(turns) < back :
+                break
+            other = Solver.faces.index(turns[-back][0])
+            if other == face :
+                amount = (amount + Optimizer.amounts[turns[-back][1:]]) % 4
+                del turns[-back]
+                if amount :
+                    turns.insert(len(turns) + 1 - back, move[0] + Optimizer.suffixes[amount])
+                return
+            if other != face ^ 1 :
+                break
+        if turns and Solver.faces.index(turns[-1][0]) == face ^ 1 and face < face ^ 1 :
+            turns.insert(len(turns) - 1, move)
+        else :
+            turns.append(move)
+
+    def optimize ( self, algorithm ) :
+        """
+            Returns the optimized algorithm as a list of moves: face turns, slice turns in the slice turn metric, and the net rotation at the end.
+        """
+        original = Optimizer.flatten(algorithm)
+        turns = []
+        rotation = 0
+        for move in original :
+            pair, o = Optimizer.decompositions[move]
+            for turn in pair :
+                Optimizer.push(turns, Solver.symmetry_moves[Cube.orientation_inverse[rotation]][turn])
+            rotation = Cube.orient_mul[rotation][o]
+        moves = turns
+        if self.metric == "stm" :
+            moves = []
+            correction = 0
+            i = 0
+            while i < len(turns) :
+                relabel = Solver.symmetry_moves[Cube.orientation_inverse[correction]]
+                pair = (relabel[turns[i]], relabel[turns[i + 1]]) if i + 1 < len(turns) else None
+                if pair in Optimizer.slices :
+                    name, o = Optimizer.slices[pair]
+                    moves.append(name)
+                    correction = Cube.orient_mul[o][correction]
+                    i += 2
+                else :
+                    moves.append(relabel[turns[i]])
+                    i += 1
+            rotation = Cube.orient_mul[correction][rotation]
+        moves = moves + Optimizer.rotation_names[rotation]
+        if not Optimizer.equivalent(Cube() * ("a: " + " ".join(moves)), Cube() * ("a: " + " ".join(original))) :
+            raise Exception(f"Invalid optimization: {' '.join(original)!r} became {' '.join(moves)!r}")
+        return moves
+
+Optimizer.compile_tables()
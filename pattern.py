@@ -0,0 +1,186 @@
+import math
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+from cube import Cube, Solver
+from batch import CubeBatch
+
+class PatternDatabase :
+    """
+        A PatternDatabase holds the exact face turn distance to solved of every state of a subset of the corners or of the edges, ignoring every other piece. Because a subset can never be solved in fewer moves than the whole cube, every entry is an admissible heuristic for Solver.solve.
+        States are ranked with a perfect hash: the positions of the pieces as a partial permutation, followed by their twists or flips. When the subset holds every piece of its kind the last twist follows from the others and is left out, so the 8 corners take 8! * 3^7 entries.
+        Depths are packed two to a byte. On disk the table follows a 64 byte header, and loading it maps the file read-only, so every process that loads the same file shares one copy through the page cache.
+    """
+
+    magic = b"RCPD"
+    version = 1
+    header = struct.Struct("<4sIQ48s")
+    unknown = 15
+
+    corners = Cube.standard_order[:8]
+    edges = Cube.standard_order[8:20]
+
+    def __init__ ( self, pieces, table ) :
+        self.pieces = list(pieces)
+        indices = [Cube.piece_index[piece] for piece in self.pieces]
+        kinds = set([len(piece) for piece in self.pieces])
+        if len(kinds) != 1 or kinds == {1} or len(set(indices)) != len(indices) :
+            raise Exception(f"Invalid pattern: {self.pieces}; expected distinct corners or distinct edges")
+        self.indices = indices
+        self.base = 0 if kinds == {3} else 8
+        self.n = 8 if kinds == {3} else 12
+        self.k = len(self.pieces)
+        self.twists = 3 if kinds == {3} else 2
+        self.free_twists = self.k - 1 if self.k == self.n else self.k
+        self.permutations = math.perm(self.n, self.k)
+        self.size = self.permutations * self.twists ** self.free_twists
+        self.place = [math.perm(self.n - 1 - i, self.k - 1 - i) for i in range(self.k)]
+        self.positions = [[position - self.base for position in Cube.position_index[piece]] for piece in self.indices]
+        self.twist = [Cube.twist_index[piece] for piece in self.indices]
+        self.orient_of = [[[None]*self.twists for position in range(self.n)] for piece in self.indices]
+        for j, piece in enumerate(self.indices) :
+            for o in range(len(Cube.orientations)) :
+                self.orient_of[j][self.positions[j][o]][self.twist[j][o]] = o
+        self.table = table
+        self.view = memoryview(table) if table is not None else None
+
+    def rank ( self, orient ) :
+        """
+            Ranks a single state given as a list of 26 orientation indices.
+        """
+        positions = []
+        rank = 0
+        for j, piece in enumerate(self.indices) :
+            position = self.positions[j][orient[piece]]
+            rank += (position - len([p for p in positions if p < position])) * self.place[j]
+            positions.append(position)
+        for j in range(self.free_twists) :
+            rank = rank * self.twists + self.twist[j][orient[self.indices[j]]]
+        return rank
+
+    def rank_batch ( self, states ) :
+        """
+            Ranks an (N, k) array holding the orientations of the pattern pieces.
+        """
+        positions = np.empty(states.shape, dtype=np.int64)
+        twists = np.empty(states.shape, dtype=np.int64)
+        for j in range(self.k) :
+            positions[:, j] = np.asarray(self.positions[j], dtype=np.int64)[states[:, j]]
+            twists[:, j] = np.asarray(self.twist[j], dtype=np.int64)[states[:, j]]
+        rank = np.zeros(len(states), dtype=np.int64)
+        for j in range(self.k) :
+            smaller = (positions[:, :j] < positions[:, j:j+1]).sum(axis = 1)
+            rank += (positions[:, j] - smaller) * self.place[j]
+        for j in range(self.free_twists) :
+            rank = rank * self.twists + twists[:, j]
+        return rank
+
+    def unrank_batch ( self, ranks ) :
+        """
+            Turns an array of ranks back into an (N, k) array of pattern piece orientations.
+        """
+        ranks = np.asarray(ranks, dtype=np.int64)
+        twists = np.zeros((len(ranks), self.k), dtype=np.int64)
+        for j in reversed(range(self.free_twists)) :
+            twists[:, j] = ranks % self.twists
+            ranks = ranks // self.twists
+        if self.free_twists < self.k :
+            twists[:, -1] = (-twists[:, :-1].sum(axis = 1)) % self.twists
+        used = np.zeros((len(ranks), self.n), dtype=bool)
+        states = np.empty((len(ranks), self.k), dtype=np.uint8)
+        rows = np.arange(len(ranks))
+        for j in range(self.k) :
+            digit = ranks // self.place[j]
+            ranks = ranks % self.place[j]
+            free = np.cumsum(~used, axis = 1)
+            position = np.argmax((free == (digit + 1)[:, None]) & ~used, axis = 1)
+            used[rows, position] = True
+            states[:, j] = np.asarray(self.orient_of[j], dtype=np.uint8)[position, twists[:, j]]
+        return states
+
+    def lookup ( self, orient ) :
+        rank = self.rank(orient)
+        return (self.view[rank >> 1] >> ((rank & 1) << 2)) & 15
+
+    def lookup_batch ( self, states ) :
+        """
+            Looks up the depths of an (N, 26) array of full states, as held by a CubeBatch.
+        """
+        rank = self.rank_batch(np.asarray(states)[:, self.indices])
+        return (np.asarray(self.table)[rank >> 1] >> ((rank & 1) << 2).astype(np.uint8)) & 15
+
+    @classmethod
+    def build ( cls, pieces, chunk = 1 << 20, debug = False ) :
+        """
+            Generates the table with a breadth-first search over the 18 face turns, one depth at a time.
+            The search keeps one unpacked byte per state and packs them into the table at the end, so building needs one and a half bytes per entry; every depth walks the states chunk entries at a time, which bounds the rest of the working memory.
+        """
+        database = cls(pieces, None)
+        # The unpacked depths are padded to an even length so they pack two to a byte; the padding stays unknown
+        padded = np.full(database.size + database.size % 2, cls.unknown, dtype=np.uint8)
+        depths = padded[:database.size]
+        solved = database.rank_batch(np.zeros((1, database.k), dtype=np.uint8))
+        depths[solved] = 0
+        transitions = [CubeBatch.transition(Cube.algorithms[move]).reshape(len(Cube.standard_order), -1)[database.indices] for move in Solver.moves]
+        columns = np.arange(database.k)
+        depth = 0
+        known = frontier = 1
+        while frontier :
+            # Near the end few states are left, so it is cheaper to look for unknown states next to the frontier
+            backward = database.size - known < frontier
+            for start in range(0, database.size, chunk) :
+                block = depths[start:start+chunk]
+                if backward :
+                    ranks = start + np.flatnonzero(block == cls.unknown)
+                    states = database.unrank_batch(ranks)
+                    hit = np.zeros(len(ranks), dtype=bool)
+                    for transition in transitions :
+                        hit |= depths[database.rank_batch(transition[columns, states])] == depth
+                    depths[ranks[hit]] = depth + 1
+                else :
+                    states = database.unrank_batch(start + np.flatnonzero(block == depth))
+                    for transition in transitions :
+                        ranks = database.rank_batch(transition[columns, states])
+                        depths[ranks[depths[ranks] == cls.unknown]] = depth + 1
+            frontier = sum([int(np.count_nonzero(depths[start:start+chunk] == depth + 1)) for start in range(0, database.size, chunk)])
+            known += frontier
+            depth += 1
+            if debug :
+                print(f"  depth {depth}: {frontier} states")
+        if depth > cls.unknown :
+            raise Exception(f"Invalid pattern: {pieces}; depth {depth} does not fit in four bits")
+        database.table = np.empty(len(padded) // 2, dtype=np.uint8)
+        for start in range(0, len(database.table), chunk) :
+            pairs = padded[2*start:2*(start+chunk)]
+            database.table[start:start+chunk] = pairs[0::2] | (pairs[1::2] << 4)
+        database.view = memoryview(database.table)
+        return database
+
+    def save ( self, path ) :
+        with open(path, "wb") as file :
+            file.write(PatternDatabase.header.pack(PatternDatabase.magic, PatternDatabase.version, self.size, " ".join(self.pieces).encode().ljust(48)))
+            file.write(np.asarray(self.table).tobytes())
+
+    @classmethod
+    def load ( cls, path ) :
+        with open(path, "rb") as file :
+            data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, size, pieces = cls.header.unpack_from(data)
+        if magic != cls.magic or version != cls.version :
+            raise Exception(f"Invalid pattern database: {path}")
+        database = cls(pieces.decode().split(), None)
+        if database.size != size or len(data) != cls.header.size + (size + 1) // 2 :
+            raise Exception(f"Invalid pattern database: {path}; expected {database.size} entries")
+        database.table = np.frombuffer(data, dtype=np.uint8, offset = cls.header.size)
+        database.view = memoryview(data)[cls.header.size:]
+        return database
+
+if __name__ == "__main__" :
+    patterns = {"corners": PatternDatabase.corners, "edges6": PatternDatabase.edges[:6], "edges7": PatternDatabase.edges[:7]}
+    if len(sys.argv) != 3 or sys.argv[1] not in patterns :
+        print(f"Usage: {sys.argv[0]} {'|'.join(patterns)} path")
+        sys.exit(1)
+    PatternDatabase.build(patterns[sys.argv[1]], debug = True).save(sys.argv[2])
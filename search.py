@@ -0,0 +1,205 @@
+import numpy as np
+
+from cube import Cube, Solver
+from batch import CubeBatch
+
+class KeySet :
+    """
+        A KeySet is an open-addressing hash table of 128 bit state keys, each split into a high and a low uint64, with the search depth at which the key was first seen.
+        Probing is linear and done for a whole array of keys at once: every round, keys that find themselves are dropped as known, keys that find an empty slot claim it, one key per slot, and the rest move on to the next slot.
+        The table doubles once it is three quarters full, which keeps probe chains short while a large set costs at most 46 bytes per key, and less than 23 right after growing.
+    """
+
+    empty = np.uint64(0xFFFFFFFFFFFFFFFF)
+    entry = 17
+    load = 0.75
+
+    def __init__ ( self, capacity = 1 << 16 ) :
+        self.bits = max(4, int(capacity - 1).bit_length())
+        self.hi = np.full(1 << self.bits, KeySet.empty, dtype=np.uint64)
+        self.lo = np.full(1 << self.bits, KeySet.empty, dtype=np.uint64)
+        self.depth = np.zeros(1 << self.bits, dtype=np.uint8)
+        self.size = 0
+
+    def __len__ ( self ) :
+        return self.size
+
+    @property
+    def nbytes ( self ) :
+        return len(self.hi) * KeySet.entry
+
+    @staticmethod
+    def grown_nbytes ( size, capacity ) :
+        while size > KeySet.load * capacity :
+            capacity *= 2
+        return capacity * KeySet.entry
+
+    def slots ( self, hi, lo ) :
+        mixed = (lo * np.uint64(0x9E3779B97F4A7C15)) ^ (hi * np.uint64(0xC2B2AE3D27D4EB4F))
+        mixed ^= mixed >> np.uint64(29)
+        return (mixed * np.uint64(0xBF58476D1CE4E5B9)) >> np.uint64(64 - self.bits)
+
+    def insert ( self, hi, lo, depth ) :
+        """
+            Adds the keys that are not in the set yet and returns a mask of them; a key repeated within the batch counts as new once.
+        """
+        # Linear probing needs an empty slot to end every chain, so the whole batch must fit first
+        if self.size + len(hi) >= len(self.hi) :
+            self.grow(self.size + len(hi))
+        new = np.zeros(len(hi), dtype=bool)
+        pending = np.arange(len(hi))
+        slots = self.slots(hi, lo).astype(np.intp)
+        mask = len(self.hi) - 1
+        while len(pending) :
+            at = slots[pending]
+            found = (self.hi[at] == hi[pending]) & (self.lo[at] == lo[pending])
+            vacant = self.hi[at] == KeySet.empty
+            claim, first = np.unique(at[vacant], return_index = True)
+            winners = pending[vacant][first]
+            self.hi[claim] = hi[winners]
+            self.lo[claim] = lo[winners]
+            self.depth[claim] = depth
+            new[winners] = True
+            self.size += len(winners)
+            # Losers of a claimed slot look at it again, as they may hold the same key as the winner
+            moving = ~found & ~vacant
+            slots[pending[moving]] = (at[moving] + 1) & mask
+            pending = pending[~found]
+            pending = pending[~new[pending]]
+        if self.size > KeySet.load * len(self.hi) :
+            self.grow(self.size)
+        return new
+
+    def lookup ( self, hi, lo ) :
+        """
+            Returns the depth of every key, or 255 for keys that are not in the set.
+        """
+        result = np.full(len(hi), 255, dtype=np.uint8)
+        pending = np.arange(len(hi))
+        slots = self.slots(hi, lo).astype(np.intp)
+        mask = len(self.hi) - 1
+        while len(pending) :
+            at = slots[pending]
+            found = (self.hi[at] == hi[pending]) & (self.lo[at] == lo[pending])
+            result[pending[found]] = self.depth[at[found]]
+            missing = self.hi[at] == KeySet.empty
+            pending = pending[~found & ~missing]
+            slots[pending] = (slots[pending] + 1) & mask
+        return result
+
+    def grow ( self, size ) :
+        hi, lo, depth = self.hi, self.lo, self.depth
+        used = hi != KeySet.empty
+        bits = self.bits
+        while size > KeySet.load * (1 << bits) :
+            bits += 1
+        self.__init__(1 << bits)
+        # Keys go back a slice at a time, as inserting holds a few temporary arrays per key
+        for d in np.unique(depth[used]) :
+            at = np.flatnonzero(used & (depth == d))
+            for start in range(0, len(at), 1 << 20) :
+                part = at[start:start + (1 << 20)]
+                self.insert(hi[part], lo[part], d)
+
+class Distance :
+    """
+        The outcome of a distance query: the exact distance when the two searches met, and otherwise None with the lower bound proven so far and the reason the search stopped.
+    """
+
+    def __init__ ( self, distance, lower_bound, nodes, reason = None ) :
+        self.distance = distance
+        self.lower_bound = lower_bound
+        self.nodes = nodes
+        self.reason = reason
+
+    def __repr__ ( self ) :
+        if self.distance is not None :
+            return f"Distance({self.distance}, nodes={self.nodes})"
+        return f"Distance(>= {self.lower_bound}, nodes={self.nodes}, {self.reason})"
+
+def keys ( states ) :
+    """
+        Packs the corners and edges of an (N, 20) or (N, 26) array of states into two uint64 keys, five bits per piece; the centers are left out, as face turns only twist them.
+    """
+    hi = np.zeros(len(states), dtype=np.uint64)
+    lo = np.zeros(len(states), dtype=np.uint64)
+    for piece in range(12) :
+        lo |= states[:, piece].astype(np.uint64) << np.uint64(5 * piece)
+    for piece in range(8) :
+        hi |= states[:, 12 + piece].astype(np.uint64) << np.uint64(5 * piece)
+    return hi, lo
+
+def unpack ( hi, lo ) :
+    """
+        Turns keys back into an (N, 20) array of the corners and edges.
+    """
+    states = np.empty((len(hi), 20), dtype=np.uint8)
+    for piece in range(12) :
+        states[:, piece] = (lo >> np.uint64(5 * piece)) & np.uint64(31)
+    for piece in range(8) :
+        states[:, 12 + piece] = (hi >> np.uint64(5 * piece)) & np.uint64(31)
+    return states
+
+# The number of new states per state of a layer of the face turn search settles near 13.35
+branching = 13.35
+
+def distance ( a, b, max_depth = 14, max_memory = 1 << 30, chunk = 1 << 15 ) :
+    """
+        Finds the number of face turns between cubes a and b, that is the length of the shortest sequence of moves that turns a into b, with a breadth-first search from both ends. Cubes may be given as anything with an orient, or as the orient bytes themselves.
+        Each side keeps the set of states it has seen and its frontier as packed keys, and the side with the smaller frontier is expanded a layer at a time, chunk states at a time, looking every new state up in the set of the other side. When the two meet the distance is exact.
+        A move only changes a piece through the orientation of that piece, so the centers are left out of the search altogether.
+        The search gives up when the next layer could push the sets and frontiers past max_memory bytes, estimated from the usual branching factor, or when the distance would exceed max_depth, and then reports every distance it has ruled out through the lower bound.
+    """
+    a = bytes(getattr(a, "orient", a))
+    b = bytes(getattr(b, "orient", b))
+    if [Cube.position_index[piece][o] for piece, o in enumerate(a[20:], 20)] != [Cube.position_index[piece][o] for piece, o in enumerate(b[20:], 20)] :
+        raise Exception("Invalid query: the centers differ, so no face turns connect the states")
+    if a[:20] == b[:20] :
+        return Distance(0, 0, 0)
+    # The face turns are closed under inversion, so the search back from b uses the same moves
+    moves = [CubeBatch.transition(move) for move in Solver.moves]
+    offsets = CubeBatch.offsets[:20]
+    sides = []
+    for start in [a, b] :
+        hi, lo = keys(np.frombuffer(start, dtype=np.uint8).reshape(1, -1))
+        seen = KeySet()
+        seen.insert(hi, lo, 0)
+        sides.append({"frontier": [(hi, lo)], "size": 1, "seen": seen, "depth": 0})
+    nodes = 2
+    while True :
+        bound = sides[0]["depth"] + sides[1]["depth"] + 1
+        if bound > max_depth :
+            return Distance(None, bound, nodes, "max_depth")
+        side, other = sorted(sides, key = lambda side : side["size"])
+        size = side["size"]
+        growth = int(size * branching) + 1
+        # The set is grown to its expected size up front, while it is held twice; frontiers take 16 bytes per key, and expanding a chunk about 160 bytes per following state
+        grown = KeySet.grown_nbytes(len(side["seen"]) + growth, len(side["seen"].hi))
+        needed = other["seen"].nbytes + grown + (side["seen"].nbytes if grown > side["seen"].nbytes else 0) + (other["size"] + size + growth) * 16 + min(chunk, size) * len(moves) * 160
+        if needed > max_memory :
+            return Distance(None, bound, nodes, "max_memory")
+        if grown > side["seen"].nbytes :
+            side["seen"].grow(len(side["seen"]) + growth)
+        layer = []
+        best = None
+        # The frontier is kept as the list of arrays it was found in, so it is never copied into one
+        for frontier_hi, frontier_lo in side["frontier"] :
+            for start in range(0, len(frontier_hi), chunk) :
+                part = unpack(frontier_hi[start:start + chunk], frontier_lo[start:start + chunk]) + offsets
+                following = np.concatenate([table[part] for table in moves])
+                hi, lo = keys(following)
+                new = side["seen"].insert(hi, lo, side["depth"] + 1)
+                nodes += len(following)
+                hi, lo = hi[new], lo[new]
+                met = other["seen"].lookup(hi, lo)
+                met = met[met != 255]
+                if len(met) :
+                    best = min(best if best is not None else 255, int(met.min()))
+                layer.append((hi, lo))
+        side["depth"] += 1
+        side["frontier"] = layer
+        side["size"] = sum([len(hi) for hi, lo in layer])
+        if best is not None :
+            return Distance(side["depth"] + best, side["depth"] + best, nodes)
+        if not side["size"] :
+            return Distance(None, bound, nodes, "exhausted")
@@ -0,0 +1,128 @@
+import collections
+import concurrent.futures
+import os
+import time
+
+from cube import Cube, Scrambler, Solver
+from twophase import Tables
+
+class Result :
+    """
+        The outcome of one job of a BatchSolver: the input index and item, the solution as a list of moves, and an error message when the job failed or timed out.
+    """
+
+    def __init__ ( self, index, item, solution = None, error = None, elapsed = 0.0 ) :
+        self.index = index
+        self.item = item
+        self.solution = solution
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__ ( self ) :
+        outcome = self.error if self.error else " ".join(self.solution)
+        return f"Result({self.index}, {outcome!r}, {self.elapsed:.3f}s)"
+
+tables = None
+
+def initialize ( path ) :
+    global tables
+    tables = Tables.load(path)
+
+def solve ( state, max_time, max_length, target_length ) :
+    start = time.perf_counter()
+    solution = Solver(Cube("", state)).solve_two_phase(max_time, max_length, target_length, tables)
+    return solution, time.perf_counter() - start
+
+class BatchSolver :
+    """
+        A BatchSolver fans two-phase solves out over a pool of worker processes and streams the results back as they complete.
+        The tables are built once by the parent and every worker maps the same files read-only, so they are neither rebuilt nor pickled per worker.
+        At most max_pending jobs are in flight at a time; the input iterable is only consumed as results are handed out, so arbitrarily long inputs run in bounded memory.
+    """
+
+    def __init__ ( self, processes = None, max_time = 1.0, max_length = 30, target_length = 0, max_pending = None, path = None ) :
+        self.processes = processes or os.cpu_count()
+        self.max_time = max_time
+        self.max_length = max_length
+        self.target_length = target_length
+        self.max_pending = max_pending or 2 * self.processes
+        self.path = path or Tables.default_path()
+        Tables.load(self.path)
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.processes, initializer = initialize, initargs = (self.path,))
+
+    def __enter__ ( self ) :
+        return self
+
+    def __exit__ ( self, *args ) :
+        self.close()
+
+    def close ( self ) :
+        self.pool.shutdown(cancel_futures = True)
+
+    @staticmethod
+    def state ( item ) :
+        """
+            Turns a Cube, an algorithm string, or a plain scramble like "R U F'" into an orientation string.
+        """
+        if isinstance(item, Cube) :
+            return item.repr_orient_str()
+        if item.startswith("a: ") or item.startswith("c: ") :
+            return (Cube() * item).repr_orient_str()
+        return (Cube() * ("a: " + item)).repr_orient_str()
+
+    def solve ( self, items, ordered = True, timeout = None ) :
+        """
+            Yields a Result for every item, in input order when ordered is set and in completion order otherwise.
+            A job that has not returned timeout seconds after submission, max_time plus five seconds by default, is reported as timed out. A job still queued is dropped, but one already running cannot be stopped, so it keeps its slot among the max_pending jobs until its worker is done with it.
+        """
+        timeout = self.max_time + 5 if timeout is None else timeout
+        items = iter(enumerate(items))
+        pending = collections.OrderedDict()
+        abandoned = set()
+        exhausted = False
+        while True :
+            abandoned = set([future for future in abandoned if not future.done()])
+            while not exhausted and len(pending) + len(abandoned) < self.max_pending :
+                try :
+                    index, item = next(items)
+                except StopIteration :
+                    exhausted = True
+                    break
+                try :
+                    future = self.pool.submit(solve, BatchSolver.state(item), self.max_time, self.max_length, self.target_length)
+                except Exception as error :
+                    future = concurrent.futures.Future()
+                    future.set_exception(error)
+                pending[future] = (index, item, time.monotonic() + timeout)
+            if not pending :
+                if exhausted :
+                    return
+                concurrent.futures.wait(abandoned, return_when = concurrent.futures.FIRST_COMPLETED)
+                continue
+            if ordered :
+                future = next(iter(pending))
+                done, waiting = concurrent.futures.wait([future], timeout = max(0, pending[future][2] - time.monotonic()))
+            else :
+                wait = max(0, min([deadline for index, item, deadline in pending.values()]) - time.monotonic())
+                done, waiting = concurrent.futures.wait(list(pending), timeout = wait, return_when = concurrent.futures.FIRST_COMPLETED)
+            if not done :
+                future = min(pending, key = lambda future : pending[future][2])
+                if not future.cancel() :
+                    abandoned.add(future)
+                index, item, deadline = pending.pop(future)
+                yield Result(index, item, error = "timeout", elapsed = timeout)
+                continue
+            for future in list(done) if not ordered else [future] :
+                index, item, deadline = pending.pop(future)
+                try :
+                    solution, elapsed = future.result()
+                    yield Result(index, item, solution, None if solution is not None else "no solution", elapsed)
+                except Exception as error :
+                    yield Result(index, item, error = str(error))
+
+    def scramble_and_solve ( self, count, scrambler = None, ordered = True ) :
+        """
+            Solves count fresh scrambles from a Scrambler; the Cube of each Result is named after its scramble.
+        """
+        scrambler = scrambler or Scrambler()
+        return self.solve((scrambler.new() for i in range(count)), ordered)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import pytest
+from cube import *
+from aio import *
+
+scramble = "F2 U' F' B D B' L B2 D' R2 U' R2 F2 B2 R2 B2 U2 R F R"
+
+def solved ( cube ) :
+    return cube.repr_orient_str()[:20] == Cube().repr_orient_str()[:20]
+
+@pytest.fixture(scope = "module")
+def path ( tmp_path_factory ) :
+    path = str(tmp_path_factory.mktemp("tables"))
+    Tables.load(path)
+    return path
+
+def run ( path, body, **options ) :
+    async def main ( ) :
+        async with AsyncSolver(path = path, **options) as solver :
+            return await body(solver)
+    return asyncio.run(main())
+
+def test_solve ( path ) :
+    async def body ( solver ) :
+        return await solver.solve(scramble)
+    result = run(path, body, max_time = 5, target_length = 30)
+    assert result.error is None
+    assert solved(Cube() * ("a: " + scramble) * ("a: " + " ".join(result.solution)))
+
+def test_deadline_returns_best_so_far ( path ) :
+    async def body ( solver ) :
+        return await solver.solve(scramble, deadline = 0.5), solver
+    result, solver = run(path, body, max_time = 30, target_length = 1)
+    assert 0.5 <= result.elapsed < 5
+    assert result.error is None and len(result.solution) <= 30
+    assert solved(Cube() * ("a: " + scramble) * ("a: " + " ".join(result.solution)))
+    assert not solver.jobs
+
+def test_coalescing ( path ) :
+    async def body ( solver ) :
+        results = await asyncio.gather(*[solver.solve(item, deadline = 0.3) for item in [scramble, "a: " + scramble, Cube() * ("a: " + scramble)]])
+        return results, solver.searches
+    results, searches = run(path, body, max_time = 30, target_length = 1)
+    assert searches == 1
+    assert len(set([" ".join(result.solution) for result in results])) == 1
+
+def test_cancellation ( path ) :
+    async def body ( solver ) :
+        task = asyncio.ensure_future(solver.solve(scramble))
+        await asyncio.sleep(0.2)
+        job = solver.jobs[BatchSolver.state(scramble)]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError) :
+            await task
+        return job, solver
+    job, solver = run(path, body, max_time = 30, target_length = 1)
+    assert job.stop.is_set()
+    assert not solver.jobs
+
+def test_invalid ( path ) :
+    async def body ( solver ) :
+        return await solver.solve("Q")
+    assert run(path, body).error is not None
+
+def test_http ( path ) :
+    async def get ( port, target, half_close = False ) :
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        if half_close :
+            writer.write_eof()
+        response = await reader.read()
+        writer.close()
+        head, body = response.split(b"\r\n\r\n", 1)
+        return head.split()[1], json.loads(body)
+    async def body ( solver ) :
+        server = await solver.serve(port = 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server :
+            return await get(port, "/solve?cube=R+U&deadline=5"), await get(port, "/missing"), await get(port, "/solve?cube=R&deadline=soon"), await get(port, "/solve?deadline=1"), await get(port, "/solve?cube=F+L&deadline=5", half_close = True)
+    (status, answer), (missing, error), (deadline, invalid), (cube, absent), (half, closed) = run(path, body, target_length = 30)
+    assert status == b"200" and answer["error"] is None
+    assert half == b"200" and solved(Cube() * "a: F L" * ("a: " + closed["solution"]))
+    assert solved(Cube() * "a: R U" * ("a: " + answer["solution"]))
+    assert missing == b"404"
+    assert deadline == b"400" and invalid["error"].startswith("Invalid deadline")
+    assert cube == b"400" and absent["error"].startswith("Invalid request")
+
+def test_lines ( path ) :
+    requests = iter(['{"id": 1, "cube": "R U", "deadline": 5}\n', 'garbage\n', '{"id": 2, "cube": "F"}\n', '{"id": 3, "cube": "F", "deadline": -1}\n', ""])
+    answers = []
+    async def reader ( ) :
+        return next(requests)
+    async def body ( solver ) :
+        await solver.lines(reader, answers.append)
+    run(path, body, target_length = 30)
+    answers = [json.loads(line) for line in answers]
+    assert sorted([answer["id"] for answer in answers if answer["error"] is None]) == [1, 2]
+    assert [answer["id"] for answer in answers if answer["error"]] == [None, 3]
@@ -0,0 +1,58 @@
+import pytest
+from cube import *
+from batch import *
+
+scrambles = [
+    "F2 U' F' B D B' L B2 D' R2 U' R2 F2 B2 R2 B2 U2 R F R",
+    "D2 L2 D' R' B2 L F L R2 U' F2 U L2 B2 U L2 U D B2 D' R",
+    "B R2 F R2 B R2 D2 F U2 F' R U' R2 F D' R F L U'",
+]
+
+@pytest.mark.parametrize("alg", ["U", "R'", "M2", "x", "OLL-Sune", "PLL-T", "a: R U R' U'"])
+def test_apply_matches_cube ( alg ) :
+    cubes = [Cube() * ("a: " + scramble) for scramble in scrambles]
+    batch = CubeBatch.from_cubes(cubes) * alg
+    step = Cube.algorithms.get(alg, alg)
+    assert batch.to_strings() == [(cube * step).repr_orient_str() for cube in cubes]
+
+def test_string_round_trip ( ) :
+    strings = [(Cube() * ("a: " + scramble)).repr_orient_str() for scramble in scrambles]
+    assert CubeBatch.from_strings(strings).to_strings() == strings
+    assert [cube.repr_orient_str() for cube in CubeBatch.from_strings(strings).to_cubes()] == strings
+
+def test_invalid_strings ( ) :
+    with pytest.raises(Exception) :
+        CubeBatch.from_strings(["--------------------------?"])
+
+def test_random_batch_is_reproducible ( tmp_path ) :
+    Scrambler(seed = 4).write(str(tmp_path / "a.txt"), 1000, chunk = 300)
+    Scrambler(seed = 4).write(str(tmp_path / "b.txt"), 1000, chunk = 300)
+    lines = (tmp_path / "a.txt").read_text().splitlines()
+    assert len(lines) == 1000 and (tmp_path / "b.txt").read_text().splitlines() == lines
+    assert len(set(lines)) == 1000
+    assert CubeBatch.from_strings(lines).states[:, 20:].max() == 0
+
+def test_bulk_conversions ( ) :
+    cubes = [Cube() * ("a: " + scramble) for scramble in scrambles] + [Scrambler(seed = 2).random_state()]
+    batch = CubeBatch.from_cubes(cubes)
+    assert batch.to_inv_strings() == [cube.repr_inv_orient_str() for cube in cubes]
+    assert batch.to_distance_strings() == [cube.repr_distance() for cube in cubes]
+    assert (CubeBatch.from_inv_strings(batch.to_inv_strings()).states == batch.states).all()
+    assert (CubeBatch.from_lines(batch.to_lines()).states == batch.states).all()
+    spaced = "\r\n".join([str(cube).split(" | ")[0] for cube in cubes]).encode() + b"\r\n\n"
+    assert (CubeBatch.from_lines(spaced).states == batch.states).all()
+    with pytest.raises(Exception) :
+        CubeBatch.from_lines(b"-" * 25 + b"?\n")
+    with pytest.raises(Exception) :
+        CubeBatch.from_inv_strings(["i" + "-" * 25])
+
+def test_transitions_are_bounded ( ) :
+    maxsize = CubeBatch.transitions.maxsize
+    try :
+        CubeBatch.transitions.maxsize = 4
+        for scramble in scrambles + ["R", "U", "F"] :
+            CubeBatch.transition("a: " + scramble)
+        assert len(CubeBatch.transitions.entries) == 4
+        assert (CubeBatch.from_cubes([Cube()]) * "a: R U").to_strings() == [(Cube() * "a: R U").repr_orient_str()]
+    finally :
+        CubeBatch.transitions.maxsize = maxsize
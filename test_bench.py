@@ -0,0 +1,24 @@
+from bench import *
+
+def test_run_is_reproducible ( ) :
+    first = run(["solve_ida", "parse_warm_cache"], seed = 3, repeat = 1, scale = 0.2)
+    second = run(["solve_ida", "parse_warm_cache"], seed = 3, repeat = 1, scale = 0.2)
+    assert list(first["results"]) == ["parse_warm_cache", "solve_ida"]
+    assert first["results"]["solve_ida"]["nodes"] == second["results"]["solve_ida"]["nodes"]
+    assert json.loads(json.dumps(first)) == first
+
+def test_run_leaves_global_state_alone ( ) :
+    state = random.getstate()
+    Cube.compile("a: R U R' U'")
+    cache = Cube.static_cache
+    run(["scrambler_new", "parse_cold_cache"], seed = 3, repeat = 2, scale = 0.01)
+    assert random.getstate() == state
+    assert Cube.static_cache is cache and "a: R U R' U'" in cache
+
+def test_compare_flags_regressions ( ) :
+    baseline = {"results": {"a": {"seconds_per_op": 1.0, "nodes": 10}, "b": {"seconds_per_op": 1.0}}}
+    current = {"results": {"a": {"seconds_per_op": 1.05, "nodes": 11}, "b": {"seconds_per_op": 1.5}, "c": {"seconds_per_op": 9.0}}}
+    regressions = compare(baseline, current, threshold = 0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("a: nodes") and regressions[1].startswith("b: ")
+    assert compare(baseline, baseline) == []
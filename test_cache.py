@@ -0,0 +1,99 @@
+import multiprocessing
+import pytest
+from cube import *
+from cache import *
+
+def solved ( cube ) :
+    return cube.repr_orient_str()[:20] == Cube().repr_orient_str()[:20]
+
+def test_symmetry_inverse ( ) :
+    cube = Cube() * "a: R U F' L2 D B'"
+    for sym in range(48) :
+        assert cube.conjugate(sym).conjugate(Solver.symmetry_inverse[sym]) == cube
+
+def test_get_put ( tmp_path ) :
+    with SolutionCache(str(tmp_path / "cache.db")) as cache :
+        cube = Cube() * "a: R U R' F"
+        assert cache.get(cube) is None
+        cache.put(cube, ["F'", "R", "U'", "R'"])
+        assert cache.get(cube) == ["F'", "R", "U'", "R'"]
+        assert len(cache) == 1
+
+def test_symmetric_states_share_an_entry ( tmp_path ) :
+    with SolutionCache(str(tmp_path / "cache.db")) as cache :
+        cube = Cube() * "a: R U F' L2 D B'"
+        cache.put(cube, Solver.invert_moves("R U F' L2 D B'".split()))
+        for sym in [1, 17, 30, 47] :
+            other = cube.conjugate(sym)
+            moves = cache.get(other)
+            assert len(moves) == 6 and solved(other * ("a: " + " ".join(moves)))
+        inverse = cube.inverse()
+        assert solved(inverse * ("a: " + " ".join(cache.get(inverse))))
+        assert len(cache) == 1
+
+def test_center_twist_is_ignored ( tmp_path ) :
+    with SolutionCache(str(tmp_path / "cache.db")) as cache :
+        cube = Cube() * "a: R U R' U'"
+        cache.put(cube, ["U", "R", "U'", "R'"])
+        twist = next(o for o in range(1, 24) if Cube.position_index[20][o] == 20)
+        twisted = Cube("", cube.orient[:20] + bytes([twist]) + cube.orient[21:])
+        assert cache.get(twisted) == ["U", "R", "U'", "R'"]
+        assert cache.get(Cube() * "a: x R") is None
+
+def test_keeps_the_shorter_solution ( tmp_path ) :
+    with SolutionCache(str(tmp_path / "cache.db")) as cache :
+        cube = Cube() * "a: R"
+        cache.put(cube, ["R", "R", "R"])
+        assert cache.get(cube) == ["R", "R", "R"]
+        cache.put(cube, ["R'"])
+        cache.put(cube, ["R2", "R"])
+        assert cache.get(cube) == ["R'"]
+        with pytest.raises(Exception) :
+            cache.put(cube, ["x"])
+
+def test_persistence_and_warm_load ( tmp_path ) :
+    path = str(tmp_path / "cache.db")
+    with SolutionCache(path) as cache :
+        cache.put(Cube() * "a: R U", ["U'", "R'"])
+    with SolutionCache(path) as cache :
+        assert len(cache.memory) == 1
+        assert cache.get(Cube() * "a: R U") == ["U'", "R'"]
+
+@pytest.mark.parametrize("policy", ["lru", "lfu"])
+def test_eviction ( tmp_path, policy ) :
+    scrambles = ["R", "R U", "R U F", "R U F L", "R U F L D", "R U F L D B"]
+    with SolutionCache(str(tmp_path / "cache.db"), max_entries = 4, policy = policy, memory = 2) as cache :
+        for scramble in scrambles[:4] :
+            cache.put(Cube() * ("a: " + scramble), Solver.invert_moves(scramble.split()))
+        for i in range(3) :
+            assert cache.get(Cube() * "a: R") is not None
+        for scramble in scrambles[4:] :
+            cache.put(Cube() * ("a: " + scramble), Solver.invert_moves(scramble.split()))
+        assert len(cache) <= 4
+        assert cache.get(Cube() * "a: R") is not None
+        assert len(cache.memory) <= 2
+
+def read ( path, queue ) :
+    with SolutionCache(path) as cache :
+        queue.put(cache.get(Cube() * "a: R U"))
+
+def test_concurrent_readers ( tmp_path ) :
+    path = str(tmp_path / "cache.db")
+    with SolutionCache(path) as cache :
+        cache.put(Cube() * "a: R U", ["U'", "R'"])
+        queue = multiprocessing.Queue()
+        readers = [multiprocessing.Process(target = read, args = (path, queue)) for i in range(3)]
+        for reader in readers :
+            reader.start()
+        results = [queue.get(timeout = 30) for reader in readers]
+        for reader in readers :
+            reader.join()
+    assert results == [["U'", "R'"]] * 3
+
+def test_solve_cached ( tmp_path ) :
+    with SolutionCache(str(tmp_path / "cache.db")) as cache :
+        cube = Cube() * "a: R U F'"
+        first = Solver(cube).solve_cached(cache, "solve")
+        assert len(first) == 3 and cache.misses == 1
+        assert Solver(cube.conjugate(5)).solve_cached(cache, "solve") == Solver.conjugate_moves(first, 5)
+        assert cache.hits == 1
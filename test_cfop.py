@@ -0,0 +1,42 @@
+import pytest
+from cube import *
+from cfop import *
+
+def solved ( cube ) :
+    return cube.repr_orient_str()[:20] == Cube().repr_orient_str()[:20]
+
+def test_index_covers_every_case ( ) :
+    assert len(LastLayer.oll) == 216 and len(LastLayer.oll_2_look) == 216
+    assert len(LastLayer.pll) == 288
+    assert len(CFOP.pairs) == 150
+
+@pytest.mark.parametrize("name", LastLayer.oll_names + LastLayer.pll_names)
+def test_recognize_case ( name ) :
+    for auf in ["", "U ", "U2 "] :
+        algorithm = LastLayer.oll.algorithms.get(name) or LastLayer.pll.algorithms[name]
+        cube = Cube() * ("a: " + " ".join(Solver.invert_moves(auf.split() + algorithm)))
+        oll = LastLayer.oll.lookup(cube)
+        oriented = cube * ("a: " + " ".join(oll))
+        assert LastLayer.oll_key(oriented) == bytes(8)
+        assert solved(oriented * ("a: " + " ".join(LastLayer.pll.lookup(oriented))))
+
+def test_unsolved_f2l_is_rejected ( ) :
+    with pytest.raises(Exception) :
+        LastLayer.pll.lookup(Cube() * "a: R")
+
+@pytest.mark.parametrize("two_look", [False, True])
+def test_solve_cfop ( two_look ) :
+    scrambler = Scrambler(seed = 5)
+    for cube in list(scrambler.stream(20)) + [scrambler.new(), Cube() * "a: x R U y'"] :
+        solver = Solver(cube)
+        solution = solver.solve_cfop(two_look)
+        assert solver.cube is cube
+        assert solved(cube * ("a: " + " ".join(solution)))
+
+def test_stages ( ) :
+    solver = Solver(Scrambler(seed = 1).random_state())
+    cross = solver.solve_cross()
+    assert len(cross) <= 8
+    assert solver.cube.orient[12:16] == bytes(4) and solver.solution == cross
+    solver.solve_f2l()
+    assert solver.cube.orient[4:8] == bytes(4) and solver.cube.orient[12:20] == bytes(8)
@@ -0,0 +1,37 @@
+import pytest
+from cube import *
+from batch import *
+from corpus import *
+
+def test_states_round_trip ( tmp_path ) :
+    batch = CubeBatch.random(1000, 0)
+    corpus = Corpus.write(str(tmp_path / "states.rcc"), batch)
+    assert len(corpus) == 1000 and corpus.offsets is None
+    assert (corpus.states == batch.states).all()
+    assert corpus[17] == batch[17] and corpus[-1] == batch[999]
+    assert [start for start, states in corpus.chunks(300)] == [0, 300, 600, 900]
+    assert sum([len(states) for start, states in corpus.chunks(300)]) == 1000
+    assert (corpus.batch(10, 20).apply("R").states == batch.apply("R").states[10:20]).all()
+    with pytest.raises(IndexError) :
+        corpus[1000]
+
+def test_moves_round_trip ( tmp_path ) :
+    scrambler = Scrambler(seed = 0)
+    cubes = [scrambler.new() for i in range(50)] + [Cube()]
+    moves = [cube.name[3:].split() for cube in cubes]
+    corpus = Corpus.write(str(tmp_path / "moves.rcc"), cubes, moves)
+    assert [cube for cube in corpus] == cubes
+    assert list(corpus[3].hist) == moves[3] and corpus[3].name == cubes[3].name
+    assert corpus.moves(50) == []
+    assert Cube() * corpus[3].name == cubes[3]
+
+def test_convert ( tmp_path ) :
+    Scrambler(seed = 2).write(str(tmp_path / "states.txt"), 500)
+    corpus = Corpus.convert(str(tmp_path / "states.txt"), str(tmp_path / "states.rcc"), chunk = 128)
+    lines = (tmp_path / "states.txt").read_text().splitlines()
+    assert [cube.repr_orient_str() for cube in corpus] == lines
+
+def test_invalid_corpus ( tmp_path ) :
+    (tmp_path / "bad.rcc").write_bytes(b"RCSC" + bytes(100))
+    with pytest.raises(Exception) :
+        Corpus(str(tmp_path / "bad.rcc"))
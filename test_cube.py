@@ -1,27 +1,35 @@
+import logging
 import pytest
 from cube import *
 
 all_faces = ["U", "D", "L", "R", "F", "B"]
 
+def run ( cube, moves ) :
+    return cube * ("a: " + " ".join(moves))
+
+def solved ( cube ) :
+    # Face turns twist the centers, which have only one visible side
+    return cube.repr_orient_str()[:20] == Cube().repr_orient_str()[:20]
+
 @pytest.mark.parametrize("face", all_faces)
 def test_equality_twice ( face ) :
-    assert Interface().run(Cube(I), [face+"2"]) == Interface().run(Cube(I), [face, face])
+    assert run(Cube(), [face+"2"]) == run(Cube(), [face, face])
 
 @pytest.mark.parametrize("face", all_faces)
 def test_counter_undo ( face ) :
-    assert Interface().run(Cube(I), [face, face+"'"]) == Cube(I)
+    assert run(Cube(), [face, face+"'"]) == Cube()
 
 @pytest.mark.parametrize("face", all_faces)
 def test_identity_quadruple ( face ) :
-    assert Interface().run(Cube(I), [face, face, face, face]) == Cube(I)
+    assert run(Cube(), [face, face, face, face]) == Cube()
 
 def test_sexy_move ( ) :
     sexy_move = ["R U R' U'"]
-    assert Interface().run(Cube(I), sexy_move * 6) == Cube(I)
+    assert run(Cube(), sexy_move * 6) == Cube()
 
 def test_t_perm ( ) :
     t_perm = ["R U R' U' R' F R2 U' R' U' R U R' F'"]
-    assert Interface().run(Cube(I), t_perm * 2) == Cube(I)
+    assert solved(run(Cube(), t_perm * 2))
 
 @pytest.mark.parametrize("scramble, solution", [
     ("F2 U' F' B D B' L B2 D' R2 U' R2 F2 B2 R2 B2 U2 R F R", "R' B2 R' F D L B' D' F U' F2 R2 L B2 L2 U2 B2 D2 F2 R2 L'"),
@@ -32,6 +40,170 @@ def test_t_perm ( ) :
     ("B R2 F R2 B R2 D2 F U2 F' R U' R2 F D' R F L U'", "U L' F' R' D F' R2 U R' F U2 F' D2 R2 B' R2 F' R2 B'"),
 ])
 def test_scramble_solve ( scramble, solution) :
-    scramble = Interface().run(Cube(I), scramble.split())
-    solution = Interface().run(scramble, solution.split())
-    assert solution == Cube(I)
+    scramble = run(Cube(), scramble.split())
+    solution = run(scramble, solution.split())
+    assert solved(solution)
+
+def test_compose_matches_string_tables ( ) :
+    cube = run(Cube(), "R U2 F' L D B2".split())
+    move = Cube() * "a: R"
+    for piece, o in enumerate(cube.orient) :
+        name = Cube.standard_order[piece]
+        orientation = Cube.orientations[o]
+        pos = cube.find_pos(name, orientation)
+        expected = cube.rotate(orientation, move.state[pos])
+        assert Cube.orientations[Cube.compose(cube.orient, move.orient)[piece]] == expected
+
+def test_state_round_trip ( ) :
+    cube = run(Cube(), "R U R' U'".split())
+    assert Cube("", cube.state).orient == cube.orient
+    assert Cube("", cube.repr_orient_str()).orient == cube.orient
+
+@pytest.mark.parametrize("scramble", ["R", "R U", "F' L2 D", "R U2 F' L"])
+def test_solve_optimal ( scramble ) :
+    solution = Solver(run(Cube(), scramble.split())).solve()
+    assert len(solution) == len(scramble.split())
+    assert solved(run(run(Cube(), scramble.split()), solution))
+
+def test_solve_budget ( ) :
+    solver = Solver(run(Cube(), "F2 U' F' B D B' L B2 D' R2 U' R2 F2 B2 R2 B2 U2 R F R".split()))
+    assert solver.solve(max_nodes = 500) is None
+    assert solver.nodes <= 501
+    assert solver.solve(max_time = 0.2) is None
+
+def test_warm_up_compiles_every_algorithm ( ) :
+    Cube.static_cache.clear()
+    assert Cube.warm_up() == len(Cube.static_cache)
+    assert all([algorithm in Cube.static_cache for algorithm in Cube.algorithms.values()])
+    misses = Cube.static_cache.misses
+    Cube() * Cube.algorithms["PLL-T"]
+    assert Cube.static_cache.misses == misses
+
+def test_nested_macro ( ) :
+    assert Cube() * Cube.algorithms["quick---------jmj--------"] == run(Cube(), "U2 M2 U' M U2 M' U' M2 U2".split())
+    assert (Cube() * "a: U2 PLL-UbM U2").hist == ("U2", "PLL-UbM", "U2")
+
+def test_wide_moves ( ) :
+    assert Cube() * "a: f" == Cube() * "a: F S"
+    assert Cube() * "a: f'" == Cube() * "a: F' S'"
+    assert Cube() * "a: f2" == Cube() * "a: F2 S S"
+
+def test_cache_is_bounded ( ) :
+    cache = AlgorithmCache(2)
+    for key in ["a", "b", "a", "c"] :
+        if cache.get(key) is None :
+            cache.put(key, key)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 1, "misses": 3}
+
+@pytest.mark.parametrize("algorithm", ["a: R Q", "R U", "c: ----", "c: ???????????????????????????"])
+def test_invalid_algorithm ( algorithm ) :
+    with pytest.raises(InvalidAlgorithm) :
+        Cube() * algorithm
+
+def test_self_referencing_macro ( ) :
+    Cube.algorithms["loop"] = "a: R loop"
+    try :
+        with pytest.raises(InvalidAlgorithm) :
+            Cube.compile("a: loop")
+    finally :
+        del Cube.algorithms["loop"]
+
+def test_cubes_are_hashable ( ) :
+    cubes = {run(Cube(), ["R", "U"]), run(Cube(), ["R", "U"]), run(Cube(), ["U", "R"])}
+    assert len(cubes) == 2
+    assert Cube() in {Cube("solved")}
+
+def test_copy_shares_state ( ) :
+    cube = run(Cube("scrambled"), ["R", "U", "F"])
+    copy = cube.copy()
+    assert copy == cube and copy is not cube
+    assert copy.orient is cube.orient and copy.hist == cube.hist and copy.name == cube.name
+    with pytest.raises(AttributeError) :
+        cube.extra = 1
+
+def test_inverse ( ) :
+    cube = run(Cube(), "R U F' D2 L B".split())
+    assert cube * cube.inverse() == Cube()
+    assert cube.inverse() == run(Cube(), Solver.invert_moves("R U F' D2 L B".split()))
+
+def test_symmetries_are_automorphisms ( ) :
+    a, b = run(Cube(), "R U F'".split()), run(Cube(), "D2 L B".split())
+    assert len(Cube.symmetry_gathers) == 48
+    for sym in range(48) :
+        assert (a * b).conjugate(sym) == a.conjugate(sym) * b.conjugate(sym)
+    assert a.conjugate(Cube.compile("a: x").orient[0]) == Cube() * "a: x'" * a * "a: x"
+
+def test_canonical ( ) :
+    moves = "R U F' D2 L B R2".split()
+    cube = run(Cube(), moves)
+    key, sym, inverted = cube.canonical()
+    assert not inverted and cube.conjugate(sym).orient == key
+    for other in range(48) :
+        assert cube.conjugate(other).canonical()[0] == key
+        assert run(Cube(), Solver.conjugate_moves(moves, other)) == cube.conjugate(other)
+    key, sym, inverted = cube.canonical(inverse = True)
+    assert cube.inverse().canonical(inverse = True)[0] == key
+    assert (cube.inverse() if inverted else cube).conjugate(sym).orient == key
+
+def test_scrambler_history_is_bounded ( ) :
+    scrambler = Scrambler(seed = 0, history = 3)
+    cubes = [scrambler.new() for i in range(5)]
+    assert list(scrambler.scrambles) == cubes[2:]
+    assert Scrambler(seed = 0).new() == cubes[0]
+
+def test_random_states ( ) :
+    cubes = list(Scrambler(seed = 1).stream(300))
+    assert cubes == list(Scrambler(seed = 1).stream(300))
+    for cube in cubes :
+        corners = [Cube.position_index[piece][o] for piece, o in enumerate(cube.orient[:8])]
+        edges = [Cube.position_index[piece][o] - 8 for piece, o in enumerate(cube.orient[8:20], 8)]
+        assert sorted(corners) == list(range(8)) and sorted(edges) == list(range(12))
+        assert Scrambler.parity(corners) == Scrambler.parity(edges)
+        assert sum([Cube.twist_index[piece][o] for piece, o in enumerate(cube.orient[:8])]) % 3 == 0
+        assert sum([Cube.twist_index[piece][o] for piece, o in enumerate(cube.orient[8:20], 8)]) % 2 == 0
+        assert Cube("", cube.name[3:]) == cube
+    assert {cube.orient[0] for cube in cubes} == set(range(24))
+
+def test_lazy_expression ( ) :
+    cube = Cube("start") * "a: F"
+    expression = cube.lazy()
+    for move in ["R", "U", "R'", "U'"] :
+        expression = expression * ("a: " + move)
+    assert expression.materialized is None
+    expected = cube * "a: R U R' U'"
+    assert expression == expected and expected == expression
+    assert expression.hist == expected.hist and expression.name == "start"
+    assert expression.repr_orient_str() == expected.repr_orient_str()
+    assert str(expression) == str(expected)
+    assert Cube() * expression == Cube() * expected
+
+def test_lazy_expression_branches ( ) :
+    base = Cube().lazy() * "a: R U"
+    left = base * "a: F"
+    right = base * "a: B" * Cube.compile("a: D")
+    assert left.steps is base.steps and right.steps is not base.steps
+    assert left == Cube() * "a: R U F"
+    assert right == Cube() * "a: R U B D"
+    assert right.hist == ("R", "U", "B", "D")
+    following = left * "a: L"
+    assert following.base is left.cube and len(following) == 1
+    assert following * (Cube().lazy() * "a: D2") == Cube() * "a: R U F L D2"
+    with pytest.raises(InvalidAlgorithm) :
+        base * "a: R Q"
+
+def test_conversion_tables ( ) :
+    cube = Cube() * "a: R U F' L2 D B'"
+    assert Cube("", cube.repr_orient_str()) == cube
+    assert Cube.decode("--------?-----------------") is None
+    assert [Cube.orientation_distances[0][o] for o in range(24)] == Cube.orientation_distance
+    for a in range(24) :
+        for b in range(24) :
+            assert Cube.orientation_distances[a][b] == Cube.orientation_distances[b][a]
+            assert Cube.orientation_distances[a][b] == Cube.orientation_distance_table[Cube.symbols[a]][Cube.symbols[b]]
+
+def test_distance_from_a_scrambled_cube ( caplog ) :
+    cube = Cube("a") * "a: R U"
+    with caplog.at_level(logging.DEBUG, logger = "cube") :
+        assert cube.distance(cube * "a: F' D") == 2
+    assert any(["| ['WGO'" in record.getMessage() for record in caplog.records])
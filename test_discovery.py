@@ -0,0 +1,50 @@
+import time
+import pytest
+from cube import *
+from discovery import *
+
+ru = ["R", "R'", "R2", "U", "U'", "U2"]
+
+def test_canonical_counts ( ) :
+    discovery = Discovery()
+    assert [len([moves for moves, orient in discovery.walk(3) if len(moves) == depth]) for depth in range(4)] == [1, 18, 243, 3240]
+    for moves, orient in discovery.walk(3, prefix = ("R",)) :
+        assert moves[0] == "R" and orient == Cube.compile("a: " + " ".join(moves)).orient
+    assert ("R", "L") in [moves for moves, orient in discovery.walk(2)]
+    assert ("L", "R") not in [moves for moves, orient in discovery.walk(2)]
+
+def test_unique_states ( ) :
+    states = [orient[:20] for moves, orient in Discovery().walk(4, unique = True)]
+    assert len(states) == len(set(states)) == 46741
+
+def test_search_state ( ) :
+    matches = list(Discovery(ru).search(Target.algorithm("a: R U R' U'"), 4))
+    assert ["R", "U", "R'", "U'"] in matches
+    for match in matches :
+        assert (Cube() * ("a: " + " ".join(match))).orient[:20] in Target.algorithm("a: R U R' U'").keys
+
+def test_search_oll ( ) :
+    matches = list(Discovery(ru).search(Target.algorithm("OLL-Sune", "oll"), 7))
+    assert ["R", "U", "R'", "U", "R", "U2", "R'"] in matches
+    for match in matches :
+        LastLayer.oll.lookup((Cube() * ("a: " + " ".join(match))).inverse())
+
+def test_invalid ( ) :
+    with pytest.raises(Exception) :
+        Discovery(["M"])
+    with pytest.raises(Exception) :
+        Target("corners", [Cube()])
+
+def test_search_parallel ( ) :
+    discovery = Discovery(ru)
+    target = Target.algorithm("a: R U R' U R U2 R'", "oll")
+    serial = sorted([" ".join(moves) for moves in discovery.search(target, 8)])
+    parallel = sorted([" ".join(moves) for moves in discovery.search_parallel(target, 8, processes = 2)])
+    assert serial == parallel and serial
+
+def test_search_parallel_close ( ) :
+    matches = Discovery(ru).search_parallel(Target.algorithm("a: R U R' U'"), 16, processes = 2)
+    assert len(next(matches)) >= 4
+    start = time.perf_counter()
+    matches.close()
+    assert time.perf_counter() - start < 5
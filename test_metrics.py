@@ -0,0 +1,95 @@
+import logging
+import threading
+import pytest
+import metrics
+from cube import *
+
+@pytest.fixture(autouse = True)
+def clean ( ) :
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+def test_disabled_by_default ( ) :
+    Cube() * "a: R U"
+    assert not metrics.enabled
+    assert metrics.snapshot() == {"counters": {}, "spans": {}}
+    assert metrics.span("anything") is metrics.no_span
+
+def test_counters_and_spans ( ) :
+    metrics.enable()
+    Cube.static_cache.clear()
+    Cube() * "a: R U R'"
+    first = metrics.snapshot()["counters"]
+    Cube() * "a: R U R'"
+    counters = metrics.snapshot()["counters"]
+    assert counters["cube.multiply"] == first["cube.multiply"] + 1 and counters["cube.cache_hit"] == first.get("cube.cache_hit", 0) + 1 and first["cube.cache_miss"] >= 1
+    solver = Solver(Cube() * "a: R U")
+    solver.solve()
+    counters = metrics.snapshot()["counters"]
+    assert counters["solver.nodes"] == solver.nodes and counters["solver.pruned"] == solver.pruned
+    assert metrics.snapshot()["spans"]["solver.solve"]["count"] == 1
+
+def test_exporter ( ) :
+    events = []
+    exporter = metrics.add_exporter(lambda kind, name, value : events.append((kind, name, value)))
+    try :
+        metrics.enable()
+        Cube() * Cube()
+        with metrics.span("block") :
+            pass
+    finally :
+        metrics.remove_exporter(exporter)
+    assert ("count", "cube.multiply", 1) in events
+    assert [event[:2] for event in events if event[0] == "span"] == [("span", "block")]
+
+def test_counters_are_thread_safe ( ) :
+    metrics.enable()
+    def work ( ) :
+        for i in range(20000) :
+            metrics.count("test.events")
+    threads = [threading.Thread(target = work) for i in range(4)]
+    for thread in threads :
+        thread.start()
+    for thread in threads :
+        thread.join()
+    assert metrics.snapshot()["counters"]["test.events"] == 80000
+
+def test_exporter_only_hears_the_profiling_thread ( ) :
+    events = []
+    exporter = metrics.add_exporter(lambda kind, name, value : events.append((threading.current_thread().name, name)))
+    try :
+        with metrics.profile() :
+            thread = threading.Thread(target = lambda : Cube() * Cube(), name = "other")
+            thread.start()
+            thread.join()
+            Cube() * Cube()
+    finally :
+        metrics.remove_exporter(exporter)
+    assert (threading.current_thread().name, "cube.multiply") in events
+    assert [event for event in events if event[0] == "other"] == []
+
+def test_profile_is_per_thread ( ) :
+    def other ( ) :
+        with metrics.profile() as inner :
+            Cube() * Cube()
+        other.report = inner.report()
+    with metrics.profile() as profile :
+        assert metrics.enabled
+        thread = threading.Thread(target = other)
+        thread.start()
+        thread.join()
+        assert other.report["counters"]["cube.multiply"] == 1
+        Solver(Scrambler(seed = 0).random_state()).solve_cfop()
+    assert not metrics.enabled
+    report = profile.report()
+    assert set(["solver.cfop", "solver.cross", "solver.f2l", "solver.oll", "solver.pll"]) <= set(report["spans"])
+    assert "cube.multiply" in report["counters"]
+    assert metrics.snapshot()["counters"] == {}
+
+def test_stage_logging ( caplog ) :
+    with caplog.at_level(logging.INFO, logger = "cube") :
+        Solver(Scrambler(seed = 0).random_state()).solve_cross(debug = True)
+        Solver(Scrambler(seed = 0).random_state()).solve_cross()
+    assert len([record for record in caplog.records if record.getMessage().startswith("cross: ")]) == 1
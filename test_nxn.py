@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from cube import *
+from nxn import *
+from optimize import Optimizer
+
+@pytest.mark.parametrize("algorithm", ["R", "U'", "F2", "L", "D", "B'", "x", "y'", "z'", "R U R' U'", "OLL-Sune"])
+def test_matches_cube ( algorithm ) :
+    cube = Cube() * ("a: " + algorithm)
+    moves = " ".join(Optimizer.flatten(algorithm)) if algorithm in Cube.algorithms else algorithm
+    nxn = NxNCube(3) * moves
+    assert nxn == NxNCube.from_cube(cube)
+    assert Optimizer.equivalent(nxn.to_cube(), cube)
+
+def test_slices_and_wide_turns ( ) :
+    assert NxNCube(3) * "2L" == NxNCube.from_cube(Cube() * "a: M")
+    assert NxNCube(3) * "Rw" == NxNCube.from_cube(Cube() * "a: r")
+    assert NxNCube(4) * "Rw Lw'" == NxNCube(4) * "x"
+    assert NxNCube(5) * "R 2R 3R 4R 5R" == NxNCube(5) * "x"
+    assert NxNCube(6) * "3Rw" == NxNCube(6) * "R 2R 3R"
+
+@pytest.mark.parametrize("n", [2, 4, 5, 6, 7])
+def test_move_orders ( n ) :
+    cube = NxNCube(n)
+    for move in ["R", "2U", "3Fw", "x"] :
+        if move[0].isdigit() and int(move[0]) > n :
+            continue
+        assert not (cube * move).is_solved() or move == "x"
+        assert cube * ([move] * 4) == cube
+    scramble = "R U2 3Rw' F 2D B' Lw".split() if n >= 3 else "R U2 F' D".split()
+    scrambled = cube * scramble
+    assert not scrambled.is_solved()
+    assert (scrambled * Solver.invert_moves(scramble)) == cube
+    assert (cube * "y x2").is_solved()
+
+def test_strings ( ) :
+    cube = NxNCube(4) * "Rw U"
+    assert NxNCube(4, str(cube)) == cube
+    with pytest.raises(Exception) :
+        NxNCube(4, "W" * 95)
+    with pytest.raises(Exception) :
+        NxNCube(4) * "5R"
+
+def test_batch ( ) :
+    puzzle = NxN.of(5)
+    moves = ["R", "2U'", "3Fw2", "L", "Dw", "B'"]
+    states = np.tile(puzzle.solved, (6, 1))
+    for i, move in enumerate(moves) :
+        states[i] = puzzle.apply(states[i], [move])
+    short = puzzle.apply(states, "R U")
+    long = puzzle.apply(states, moves * 10)
+    for state, a, b in zip(states, short, long) :
+        assert (a == (NxNCube(5, state) * "R U").state).all()
+        assert (b == (NxNCube(5, state) * (moves * 10)).state).all()
+    assert (puzzle.apply(long, Solver.invert_moves(moves * 10)) == states).all()
+    assert puzzle.is_solved(puzzle.apply(states[:1], "R'")).all()
+
+def test_conversion_roundtrip ( ) :
+    cube = Scrambler(seed = 1).random_state()
+    assert Optimizer.equivalent(NxNCube.from_cube(cube).to_cube(), cube)
+    with pytest.raises(Exception) :
+        NxNCube(4).to_cube()
+    broken = NxNCube(3).state.copy()
+    broken[0], broken[9] = broken[9], broken[0]
+    with pytest.raises(Exception) :
+        NxNCube(3, broken).to_cube()
+
+def test_compiled_moves_are_bounded ( ) :
+    puzzle = NxN.of(4)
+    for i in range(puzzle.cache.maxsize + 10) :
+        puzzle.compile(["R"] * (i % 3 + 1) + ["U"] * (i // 3 + 1))
+    assert len(puzzle.cache) == puzzle.cache.maxsize
+    assert (puzzle.compile("R U R' U'") == puzzle.compile(["R", "U", "R'", "U'"])).all()
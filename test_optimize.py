@@ -0,0 +1,49 @@
+import random
+import pytest
+from cube import *
+from optimize import *
+
+def cost ( moves ) :
+    pairs = [Optimizer.decompositions[move][0] for move in Optimizer.flatten(moves)]
+    return sum([len(pair) for pair in pairs])
+
+@pytest.mark.parametrize("metric", Optimizer.metrics)
+def test_every_algorithm ( metric ) :
+    optimizer = Optimizer(metric)
+    for name, algorithm in Cube.algorithms.items() :
+        if algorithm.startswith("a: ") :
+            moves = optimizer.optimize(algorithm)
+            assert Optimizer.equivalent(Cube() * ("a: " + " ".join(moves)), Cube() * algorithm)
+            assert cost(moves) <= cost(algorithm)
+
+@pytest.mark.parametrize("algorithm, expected", [
+    ("a: R U U' R'", []),
+    ("a: R L U U' R'", ["L"]),
+    ("a: L R L", ["R", "L2"]),
+    ("a: U2 D U2", ["D"]),
+    ("a: x U x'", ["F"]),
+    ("a: r U r'", ["L", "F", "L'"]),
+    ("a: y", ["y"]),
+    ("a: U2 PLL-UbM U2", ["U2", "R2", "L2", "D'", "R", "L'", "F2", "R'", "L", "D'", "R2", "L2", "U2"]),
+])
+def test_optimize ( algorithm, expected ) :
+    assert Optimizer().optimize(algorithm) == expected
+
+def test_slice_metric_keeps_slices ( ) :
+    assert Optimizer("stm").optimize("a: M2 U M U2 M' U M2") == ["M2", "U", "M", "U2", "M'", "U", "M2"]
+    assert Optimizer("stm").optimize("a: R L'") == ["M", "x"]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_sequences ( seed ) :
+    rng = random.Random(seed)
+    names = [name for name, algorithm in Cube.algorithms.items() if algorithm.startswith("c: ")]
+    moves = [rng.choice(names) for i in range(40)]
+    for metric in Optimizer.metrics :
+        optimized = Optimizer(metric).optimize(moves)
+        assert Optimizer.equivalent(Cube() * ("a: " + " ".join(optimized)), Cube() * ("a: " + " ".join(moves)))
+
+def test_invalid ( ) :
+    with pytest.raises(Exception) :
+        Optimizer("qtm")
+    with pytest.raises(InvalidAlgorithm) :
+        Optimizer().optimize("a: R Q")
@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import pytest
+from cube import *
+from batch import *
+from pattern import *
+
+def scrambles ( count, length = 25, seed = 0 ) :
+    rng = random.Random(seed)
+    return [Cube() * ("a: " + " ".join([rng.choice(Solver.moves) for i in range(length)])) for j in range(count)]
+
+@pytest.fixture(scope = "module")
+def database ( ) :
+    return PatternDatabase.build(PatternDatabase.edges[:3])
+
+@pytest.mark.parametrize("pieces", [PatternDatabase.corners, PatternDatabase.edges, PatternDatabase.edges[:7]])
+def test_rank_round_trip ( pieces ) :
+    database = PatternDatabase(pieces, None)
+    states = CubeBatch.from_cubes(scrambles(20)).states[:, database.indices]
+    ranks = database.rank_batch(states)
+    assert (ranks < database.size).all()
+    assert len(set(ranks.tolist())) == len(ranks)
+    assert (database.unrank_batch(ranks) == states).all()
+
+def test_build_covers_every_state ( database ) :
+    depths = database.lookup_batch(np.zeros((1, 26), dtype=np.uint8))
+    assert depths[0] == 0
+    table = np.asarray(database.table)
+    assert ((table & 15) != PatternDatabase.unknown).all()
+    assert ((table >> 4) != PatternDatabase.unknown).all()
+
+def test_depths_are_admissible ( database ) :
+    for cube in scrambles(10, length = 4, seed = 1) :
+        assert database.lookup(cube.orient) <= len(Solver(cube).solve())
+
+def test_save_and_load ( database, tmp_path ) :
+    database.save(tmp_path / "edges.pdb")
+    loaded = PatternDatabase.load(tmp_path / "edges.pdb")
+    assert loaded.pieces == database.pieces
+    batch = CubeBatch.from_cubes(scrambles(20))
+    assert (loaded.lookup_batch(batch.states) == database.lookup_batch(batch.states)).all()
+    assert [loaded.lookup(cube.orient) for cube in batch.to_cubes()] == database.lookup_batch(batch.states).tolist()
+
+def test_solver_heuristic ( database ) :
+    cube = Cube() * "a: R U2 F' L D"
+    solver = Solver(cube)
+    solution = solver.solve(heuristics = Solver.pattern_heuristics() + [database.lookup])
+    assert len(solution) == 5
@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import pytest
+from cube import *
+from search import *
+
+def walk ( seed, length ) :
+    rng = random.Random(seed)
+    return Cube() * ("a: " + " ".join([rng.choice(Solver.moves) for i in range(length)]))
+
+def test_key_set ( ) :
+    rng = np.random.default_rng(0)
+    hi = rng.integers(0, 50, 5000).astype(np.uint64)
+    lo = rng.integers(0, 50, 5000).astype(np.uint64)
+    keys = KeySet(16)
+    new = keys.insert(hi, lo, 1)
+    pairs = list(zip(hi.tolist(), lo.tolist()))
+    assert new.sum() == len(keys) == len(set(pairs))
+    assert all([pairs.index(pair) == i for i, pair in enumerate(pairs) if new[i]])
+    assert not keys.insert(hi, lo, 2).any()
+    assert (keys.lookup(hi, lo) == 1).all()
+    assert (keys.lookup(hi + np.uint64(100), lo) == 255).all()
+
+@pytest.mark.parametrize("seed", range(4))
+def test_distance_matches_ida ( seed ) :
+    cube = walk(seed, 5)
+    assert distance(Cube(), cube).distance == len(Solver(cube).solve())
+    assert distance(cube, Cube()).distance == len(Solver(cube).solve())
+
+def test_distance_between_scrambles ( ) :
+    a = walk(1, 20)
+    b = a * "a: R U F' L2"
+    assert distance(a, b).distance == 4
+    assert distance(a, a).distance == 0
+    assert distance(a.orient, b).distance == 4
+    assert Cube().distance(walk(3, 3)) == len(Solver(walk(3, 3)).solve())
+
+def test_lower_bound ( ) :
+    cube = walk(2, 20)
+    result = distance(Cube(), cube, max_depth = 5)
+    assert result.distance is None and result.reason == "max_depth" and result.lower_bound == 6
+    result = distance(Cube(), cube, max_memory = 1 << 23)
+    assert result.distance is None and result.reason == "max_memory" and result.lower_bound >= 4
+    assert Cube().distance(cube, max_memory = 1 << 23) == -1
+
+def test_centers_must_match ( ) :
+    with pytest.raises(Exception) :
+        distance(Cube(), Cube() * "a: x")
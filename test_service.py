@@ -0,0 +1,60 @@
+import pytest
+from cube import *
+from service import *
+
+scrambles = [
+    "F2 U' F' B D B' L B2 D' R2 U' R2 F2 B2 R2 B2 U2 R F R",
+    "D2 L2 D' R' B2 L F L R2 U' F2 U L2 B2 U L2 U D B2 D' R",
+    "B R2 F R2 B R2 D2 F U2 F' R U' R2 F D' R F L U'",
+    "a: R U R' U'",
+]
+
+def solved ( cube ) :
+    return cube.repr_orient_str()[:20] == Cube().repr_orient_str()[:20]
+
+@pytest.fixture(scope = "module")
+def service ( tmp_path_factory ) :
+    with BatchSolver(processes = 2, max_time = 5, target_length = 30, path = str(tmp_path_factory.mktemp("tables"))) as service :
+        yield service
+
+def test_state ( ) :
+    assert BatchSolver.state("R U") == (Cube() * "a: R U").repr_orient_str()
+    assert BatchSolver.state("a: R U") == BatchSolver.state(Cube() * "a: R U")
+
+def test_ordered ( service ) :
+    results = list(service.solve(scrambles + [Cube() * "a: F"]))
+    assert [result.index for result in results] == list(range(len(scrambles) + 1))
+    for result in results :
+        assert result.error is None
+        assert solved(Cube("", BatchSolver.state(result.item)) * ("a: " + " ".join(result.solution)))
+
+def test_unordered ( service ) :
+    results = list(service.solve(scrambles, ordered = False))
+    assert sorted([result.index for result in results]) == list(range(len(scrambles)))
+
+def test_invalid_item ( service ) :
+    results = list(service.solve(["R U", "Q"]))
+    assert results[0].error is None
+    assert results[1].error is not None
+
+def test_timeout ( service ) :
+    results = list(service.solve(scrambles[:1], timeout = 0))
+    assert results[0].error == "timeout"
+
+def test_scramble_and_solve ( service ) :
+    for result in service.scramble_and_solve(3) :
+        assert solved(result.item * ("a: " + " ".join(result.solution)))
+
+def test_timed_out_jobs_hold_their_slots ( service ) :
+    submitted = []
+    submit = service.pool.submit
+    def track ( *args ) :
+        assert len([future for future in submitted if not future.done()]) < service.max_pending
+        submitted.append(submit(*args))
+        return submitted[-1]
+    service.pool.submit = track
+    try :
+        results = list(service.solve(scrambles[:3] * 3, timeout = 0.2))
+    finally :
+        del service.pool.submit
+    assert len(results) == 9 and len(submitted) == len(results)
@@ -0,0 +1,55 @@
+import random
+import pytest
+from cube import *
+from twophase import *
+from batch import CubeBatch
+
+def scramble ( seed, length = 25 ) :
+    rng = random.Random(seed)
+    return Cube() * ("a: " + " ".join([rng.choice(Solver.moves) for i in range(length)]))
+
+def solved ( cube ) :
+    return cube.repr_orient_str()[:20] == Cube().repr_orient_str()[:20]
+
+@pytest.fixture(scope = "module")
+def tables ( tmp_path_factory ) :
+    return Tables.load(str(tmp_path_factory.mktemp("tables")))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cubie_moves_match_cube ( seed ) :
+    rng = random.Random(seed)
+    moves = [rng.randrange(len(Solver.moves)) for i in range(20)]
+    cp, co, ep, eo = Cubie.from_cube(Cube())
+    for move in moves :
+        cp, co = Cubie.apply(cp, co, Cubie.corner_moves[move], 3)
+        ep, eo = Cubie.apply(ep, eo, Cubie.edge_moves[move], 2)
+    assert (cp, co, ep, eo) == Cubie.from_cube(Cube() * ("a: " + " ".join([Solver.moves[move] for move in moves])))
+
+def test_solved_cube ( tables ) :
+    assert TwoPhaseSolver(tables).solve(Cube()) == []
+
+@pytest.mark.parametrize("seed", range(3))
+def test_solve ( tables, seed ) :
+    cube = scramble(seed)
+    solution = TwoPhaseSolver(tables).solve(cube, max_time = 5, target_length = 26)
+    assert len(solution) <= 26
+    assert solved(cube * ("a: " + " ".join(solution)))
+
+def test_solver_two_phase ( tables ) :
+    cube = scramble(10)
+    solution = Solver(cube).solve_two_phase(max_time = 0.5, tables = tables)
+    assert solved(cube * ("a: " + " ".join(solution)))
+
+def test_short_scramble_stays_short ( tables ) :
+    cube = Cube() * "a: R U F'"
+    assert len(TwoPhaseSolver(tables).solve(cube, max_time = 0.5)) == 3
+
+@pytest.mark.parametrize("seed", range(3))
+def test_solve_random_state ( tables, seed ) :
+    cube = Scrambler(seed = seed).random_state()
+    solution = TwoPhaseSolver(tables).solve(cube, max_time = 5, target_length = 30)
+    assert solved(cube * ("a: " + " ".join(solution)))
+    batch = CubeBatch.random(3, seed)
+    for cube in batch.to_cubes() :
+        solution = TwoPhaseSolver(tables).solve(cube, max_time = 5, target_length = 30)
+        assert solved(cube * ("a: " + " ".join(solution)))
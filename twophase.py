@@ -0,0 +1,313 @@
+import itertools
+import math
+import os
+import time
+
+import numpy as np
+
+from cube import Cube, Solver
+
+class Cubie :
+    """
+        The cubie level view of a Cube used by the two-phase solver: for every corner and edge position, which piece sits there and how it is twisted or flipped.
+        Pieces and positions are numbered in standard_order, corners 0-7 and edges 0-11, so the four UD-slice edges GO, GR, BO and BR are edges 8-11.
+        A face turn moves the piece at position a to position perm[b] = a and adds twist[b] to its twist.
+    """
+
+    corner_moves = []
+    edge_moves = []
+
+    @classmethod
+    def compile_moves ( cls ) :
+        for move in Solver.moves :
+            orient = (Cube() * Cube.algorithms[move]).orient
+            for pieces, moves in [(range(0, 8), cls.corner_moves), (range(8, 20), cls.edge_moves)] :
+                perm = [None]*len(pieces)
+                twist = [None]*len(pieces)
+                for piece in pieces :
+                    position = Cube.position_index[piece][orient[piece]]
+                    perm[position - pieces[0]] = piece - pieces[0]
+                    twist[position - pieces[0]] = Cube.twist_index[piece][orient[piece]]
+                moves.append((perm, twist))
+
+    @staticmethod
+    def from_cube ( cube ) :
+        cp, co, ep, eo = [None]*8, [None]*8, [None]*12, [None]*12
+        for piece, o in enumerate(cube.orient[:20]) :
+            position = Cube.position_index[piece][o]
+            if piece < 8 :
+                cp[position], co[position] = piece, Cube.twist_index[piece][o]
+            else :
+                ep[position - 8], eo[position - 8] = piece - 8, Cube.twist_index[piece][o]
+        return cp, co, ep, eo
+
+    @staticmethod
+    def apply ( pieces, twists, move, modulo ) :
+        perm, twist = move
+        return [pieces[a] for a in perm], [(twists[a] + t) % modulo for a, t in zip(perm, twist)]
+
+Cubie.compile_moves()
+
+class Coordinates :
+    """
+        Vectorized encodings of cubie arrays into the coordinates of the two-phase algorithm.
+        Phase 1 uses the corner twist (3^7), the edge flip (2^11) and the positions of the UD-slice edges (12 choose 4); phase 2 uses the permutations of the corners (8!), of the U and D edges (8!) and of the slice edges (4!).
+    """
+
+    choose = np.array([[math.comb(n, k) for k in range(5)] for n in range(12)], dtype=np.int64)
+    solved_slice = 494
+
+    @staticmethod
+    def twist ( co ) :
+        return (np.asarray(co)[:, :7] * (3 ** np.arange(6, -1, -1))).sum(axis = 1)
+
+    @staticmethod
+    def flip ( eo ) :
+        return (np.asarray(eo)[:, :11] * (2 ** np.arange(10, -1, -1))).sum(axis = 1)
+
+    @staticmethod
+    def slice ( ep ) :
+        mask = (np.asarray(ep) >= 8).astype(np.int64)
+        count = np.cumsum(mask, axis = 1)
+        return (mask * Coordinates.choose[np.arange(12)[None, :], count]).sum(axis = 1)
+
+    @staticmethod
+    def permutation ( perm ) :
+        perm = np.asarray(perm, dtype=np.int64)
+        n = perm.shape[1]
+        rank = np.zeros(len(perm), dtype=np.int64)
+        for i in range(n) :
+            rank += (perm[:, i+1:] < perm[:, i:i+1]).sum(axis = 1) * math.factorial(n - 1 - i)
+        return rank
+
+    @staticmethod
+    def unrank_permutation ( ranks, n ) :
+        ranks = np.asarray(ranks, dtype=np.int64)
+        used = np.zeros((len(ranks), n), dtype=bool)
+        perm = np.empty((len(ranks), n), dtype=np.int64)
+        rows = np.arange(len(ranks))
+        for i in range(n) :
+            digit = ranks // math.factorial(n - 1 - i)
+            ranks = ranks % math.factorial(n - 1 - i)
+            free = np.cumsum(~used, axis = 1)
+            perm[:, i] = np.argmax((free == (digit + 1)[:, None]) & ~used, axis = 1)
+            used[rows, perm[:, i]] = True
+        return perm
+
+    @staticmethod
+    def digits ( values, base, n ) :
+        values = np.asarray(values, dtype=np.int64)
+        digits = np.zeros((len(values), n + 1), dtype=np.int64)
+        for i in reversed(range(n)) :
+            digits[:, i] = values % base
+            values = values // base
+        digits[:, n] = (-digits[:, :n].sum(axis = 1)) % base
+        return digits
+
+class Tables :
+    """
+        The move and pruning tables of the two-phase solver, built with NumPy once and kept as .npy files.
+        Loading maps the files read-only, so solver processes that load the same directory share a single copy of the tables.
+    """
+
+    phase2_moves = [Solver.moves.index(move) for move in ["U", "U'", "U2", "D", "D'", "D2", "R2", "L2", "F2", "B2"]]
+    names = ["twist_move", "flip_move", "slice_move", "corner_move", "edge_move", "slice_perm_move", "twist_slice_prune", "flip_slice_prune", "corner_slice_prune", "edge_slice_prune"]
+    cache = {}
+
+    def __init__ ( self, arrays ) :
+        for name in Tables.names :
+            setattr(self, name, memoryview(np.ascontiguousarray(arrays[name]).reshape(-1)))
+
+    @staticmethod
+    def default_path ( ) :
+        return os.environ.get("CUBE_TABLES", os.path.join(os.path.expanduser("~"), ".cache", "rubiks-cube-solver"))
+
+    @classmethod
+    def load ( cls, path = None ) :
+        path = path or cls.default_path()
+        if path not in cls.cache :
+            files = {name: os.path.join(path, f"{name}.npy") for name in cls.names}
+            if not all([os.path.exists(file) for file in files.values()]) :
+                arrays = cls.build()
+                os.makedirs(path, exist_ok = True)
+                for name, array in arrays.items() :
+                    np.save(files[name] + ".tmp.npy", array)
+                    os.replace(files[name] + ".tmp.npy", files[name])
+            cls.cache[path] = cls({name: np.load(file, mmap_mode = "r") for name, file in files.items()})
+        return cls.cache[path]
+
+    @staticmethod
+    def move_table ( pieces, twists, encode, moves, modulo ) :
+        table = np.empty((len(pieces), len(moves)), dtype=np.uint16)
+        for column, move in enumerate(moves) :
+            perm, twist = move
+            table[:, column] = encode(pieces[:, perm], (twists[:, perm] + twist) % modulo)
+        return table
+
+    @staticmethod
+    def prune ( move_a, move_b, start ) :
+        """
+            Breadth-first search over the product of two coordinates, giving the exact number of moves needed to solve both.
+        """
+        size_b = len(move_b)
+        depths = np.full(len(move_a) * size_b, 255, dtype=np.uint8)
+        depths[start] = 0
+        frontier = np.array([start], dtype=np.int64)
+        depth = 0
+        while len(frontier) :
+            found = (move_a[frontier // size_b].astype(np.int64) * size_b + move_b[frontier % size_b]).reshape(-1)
+            depth += 1
+            depths[found[depths[found] == 255]] = depth
+            frontier = np.flatnonzero(depths == depth)
+        return depths
+
+    @classmethod
+    def build ( cls ) :
+        corner_moves = Cubie.corner_moves
+        edge_moves = Cubie.edge_moves
+        phase2_edge_moves = [([perm[a] for a in range(8)], twist[:8]) for perm, twist in [edge_moves[move] for move in cls.phase2_moves]]
+        phase2_slice_moves = [([perm[a] - 8 for a in range(8, 12)], twist[8:]) for perm, twist in [edge_moves[move] for move in cls.phase2_moves]]
+
+        twists = Coordinates.digits(np.arange(3 ** 7), 3, 7)
+        flips = Coordinates.digits(np.arange(2 ** 11), 2, 11)
+        combinations = np.zeros((495, 12), dtype=np.int64)
+        for positions in itertools.combinations(range(12), 4) :
+            mask = np.zeros((1, 12), dtype=np.int64)
+            mask[0, list(positions)] = 8
+            combinations[Coordinates.slice(mask)[0]] = mask[0]
+        zeros = lambda count, n : np.zeros((count, n), dtype=np.int64)
+        permutations = Coordinates.unrank_permutation(np.arange(40320), 8)
+        slices = Coordinates.unrank_permutation(np.arange(24), 4)
+
+        arrays = {}
+        arrays["twist_move"] = cls.move_table(zeros(len(twists), 8), twists, lambda p, t : Coordinates.twist(t), corner_moves, 3)
+        arrays["flip_move"] = cls.move_table(zeros(len(flips), 12), flips, lambda p, t : Coordinates.flip(t), edge_moves, 2)
+        arrays["slice_move"] = cls.move_table(combinations, zeros(495, 12), lambda p, t : Coordinates.slice(p), edge_moves, 2)
+        arrays["corner_move"] = cls.move_table(permutations, zeros(40320, 8), lambda p, t : Coordinates.permutation(p), corner_moves, 3)
+        arrays["edge_move"] = cls.move_table(permutations, zeros(40320, 8), lambda p, t : Coordinates.permutation(p), phase2_edge_moves, 2)
+        arrays["slice_perm_move"] = cls.move_table(slices, zeros(24, 4), lambda p, t : Coordinates.permutation(p), phase2_slice_moves, 2)
+        arrays["twist_slice_prune"] = cls.prune(arrays["twist_move"], arrays["slice_move"], Coordinates.solved_slice)
+        arrays["flip_slice_prune"] = cls.prune(arrays["flip_move"], arrays["slice_move"], Coordinates.solved_slice)
+        arrays["corner_slice_prune"] = cls.prune(arrays["corner_move"][:, cls.phase2_moves], arrays["slice_perm_move"], 0)
+        arrays["edge_slice_prune"] = cls.prune(arrays["edge_move"], arrays["slice_perm_move"], 0)
+        return arrays
+
+class TwoPhaseSolver :
+    """
+        Kociemba's two-phase algorithm. Phase 1 brings the cube into the subgroup <U, D, R2, L2, F2, B2>, where every twist and flip is solved and the slice edges are in the slice; phase 2 solves the cube using only those moves.
+        The first solution usually takes a little over twenty moves. The search then keeps going with a tighter length limit, and returns the shortest solution found when the deadline passes.
+        The shortest solution so far is kept in best while the search runs, so another thread can read it, and setting the stop event ends the search early the same way the deadline does.
+    """
+
+    max_phase2 = 12
+
+    def __init__ ( self, tables = None ) :
+        self.tables = tables or Tables.load()
+        self.nodes = 0
+        self.best = None
+
+    def solve ( self, cube, max_time = 1.0, max_length = 30, target_length = 0, stop = None ) :
+        """
+            Returns the shortest solution found within max_time seconds as a list of moves, or None when there is no solution of at most max_length moves in that time.
+            The search stops early once a solution of at most target_length moves is found, or once stop, a threading.Event, is set.
+        """
+        for center in range(20, 26) :
+            if Cube.position_index[center][cube.orient[center]] != center :
+                raise Exception(f"Invalid state: {cube.repr_orient_str()}; the centers are not in place")
+        tables = self.tables
+        twist_move, flip_move, slice_move, corner_move = tables.twist_move, tables.flip_move, tables.slice_move, tables.corner_move
+        edge_move, slice_perm_move = tables.edge_move, tables.slice_perm_move
+        twist_slice_prune, flip_slice_prune = tables.twist_slice_prune, tables.flip_slice_prune
+        corner_slice_prune, edge_slice_prune = tables.corner_slice_prune, tables.edge_slice_prune
+        phase2_moves = Tables.phase2_moves
+        # Successor moves after each previous face, skipping the same face and opposite faces in non-canonical order
+        allowed = lambda face, prev : face != prev and not (face ^ 1 == prev and face < prev)
+        phase1_successors = [[(move, move // 3) for move in range(18) if allowed(move // 3, prev)] for prev in range(-1, 6)]
+        phase2_successors = [[(i, move, move // 3) for i, move in enumerate(phase2_moves) if allowed(move // 3, prev)] for prev in range(-1, 6)]
+        deadline = time.perf_counter() + max_time
+        cp, co, ep, eo = Cubie.from_cube(cube)
+        best = []
+        limit = [max_length]
+        found = [False]
+        path = []
+        self.nodes = 0
+        self.best = None
+
+        class Done ( Exception ) :
+            pass
+
+        def tick ( ) :
+            self.nodes += 1
+            if self.nodes & 1023 == 0 and (time.perf_counter() > deadline or (stop is not None and stop.is_set())) :
+                raise Done()
+
+        def phase2 ( corners, edges, slices, togo, prev ) :
+            tick()
+            if togo == 0 :
+                return corners == 0 and edges == 0 and slices == 0
+            for i, move, face in phase2_successors[prev + 1] :
+                s = slice_perm_move[slices*10 + i]
+                c = corner_move[corners*18 + move]
+                if corner_slice_prune[c*24 + s] >= togo :
+                    continue
+                e = edge_move[edges*10 + i]
+                if edge_slice_prune[e*24 + s] >= togo :
+                    continue
+                path.append(move)
+                if phase2(c, e, s, togo - 1, face) :
+                    return True
+                path.pop()
+            return False
+
+        def start_phase2 ( corners ) :
+            pieces, twists = ep, eo
+            for move in path :
+                pieces, twists = Cubie.apply(pieces, twists, Cubie.edge_moves[move], 2)
+            edges = int(Coordinates.permutation([pieces[:8]])[0])
+            slices = int(Coordinates.permutation([[piece - 8 for piece in pieces[8:]]])[0])
+            depth1 = len(path)
+            prev = path[-1] // 3 if path else -1
+            estimate = max(corner_slice_prune[corners*24 + slices], edge_slice_prune[edges*24 + slices])
+            for depth2 in range(estimate, min(limit[0] - depth1, TwoPhaseSolver.max_phase2) + 1) :
+                if phase2(corners, edges, slices, depth2, prev) :
+                    best[:] = [Solver.moves[move] for move in path]
+                    self.best = list(best)
+                    found[0] = True
+                    del path[depth1:]
+                    limit[0] = len(best) - 1
+                    if len(best) <= target_length :
+                        raise Done()
+                    return
+
+        def phase1 ( twist, flip, slc, corners, togo, prev ) :
+            tick()
+            if togo + len(path) > limit[0] :
+                return
+            if togo == 0 :
+                if twist == 0 and flip == 0 and slc == Coordinates.solved_slice and (not path or path[-1] not in phase2_moves) :
+                    start_phase2(corners)
+                return
+            for move, face in phase1_successors[prev + 1] :
+                s = slice_move[slc*18 + move]
+                t = twist_move[twist*18 + move]
+                if twist_slice_prune[t*495 + s] >= togo :
+                    continue
+                f = flip_move[flip*18 + move]
+                if flip_slice_prune[f*495 + s] >= togo :
+                    continue
+                path.append(move)
+                phase1(t, f, s, corner_move[corners*18 + move], togo - 1, face)
+                path.pop()
+
+        twist = int(Coordinates.twist([co])[0])
+        flip = int(Coordinates.flip([eo])[0])
+        slc = int(Coordinates.slice([ep])[0])
+        corners = int(Coordinates.permutation([cp])[0])
+        try :
+            depth1 = max(twist_slice_prune[twist*495 + slc], flip_slice_prune[flip*495 + slc])
+            while depth1 <= limit[0] :
+                phase1(twist, flip, slc, corners, depth1, -1)
+                depth1 += 1
+        except Done :
+            pass
+        return best if found[0] else None